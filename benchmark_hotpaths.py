@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Hot path benchmarks for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Times each stage of a check on its own: probing a loopback target, mapping an
+RTT to (bars, status), drawing the tray icon for every state and updating the
+tray through a stub pystray backend. Reports operations per second, median
+and p99 latency, and the memory each operation allocates (peak and retained,
+from tracemalloc).
+
+Usage:
+    python benchmark_hotpaths.py [--seconds 1] [--only NAME] [--json results.json]
+    python benchmark_hotpaths.py --check [--threshold 1.0] [--alloc-threshold 0.1]
+    python benchmark_hotpaths.py --save-baseline
+
+--check compares against benchmark_baseline.json and exits with status 1 when
+a benchmark's median is slower or it allocates more than the thresholds allow,
+so CI can run it after the tests. Allocations are nearly deterministic and get a tight
+threshold; timings depend on the machine and its load, so refresh the baseline
+with --save-baseline on the machine that runs the check.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(PROJECT_DIR, "benchmark_baseline.json")
+
+# Settings for every benchmark; nothing leaves the machine
+BENCHMARK_SETTINGS = {
+    "ping_host": "127.0.0.1",
+    "timeout": 1,
+    "history": False,
+    "dns_probe": False,
+    "smoothing": True,
+    "watch_network": False,
+    "watch_settings": False,
+}
+
+# RTTs (ms) covering every rung of the classification ladder, plus losses
+LADDER_SAMPLES = (12.0, 75.0, 150.0, 350.0, 800.0, 1500.0, 2500.0, None)
+
+ALLOCATION_OPS = 100  # Operations traced by tracemalloc per benchmark
+
+
+def install_stub_pystray():
+    """Put a pystray stand-in in sys.modules that records icon and title updates"""
+
+    class Icon:
+        def __init__(self, name, icon=None, title=None, menu=None):
+            self.name = name
+            self.icon = icon
+            self.title = title
+            self.menu = menu
+
+    class Menu:
+        SEPARATOR = object()
+
+        def __init__(self, *items):
+            self.items = items
+
+    class MenuItem:
+        def __init__(self, text, action, **options):
+            self.text = text
+            self.action = action
+            self.options = options
+
+    stub = types.ModuleType("pystray")
+    stub.Icon = Icon
+    stub.Menu = Menu
+    stub.MenuItem = MenuItem
+    sys.modules["pystray"] = stub
+
+
+class LoopbackListener:
+    """TCP listener on 127.0.0.1 that accepts and closes every connection"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(128)
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.accept_loop, daemon=True)
+        self.thread.start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            conn.close()
+
+    def close(self):
+        self.sock.close()
+
+
+class Fixture:
+    """Monitor and widget set up for benchmarking, with no tray and no threads"""
+
+    def __init__(self):
+        sys.path.insert(0, PROJECT_DIR)
+        install_stub_pystray()
+        from taskbar_network_widget import NetworkTaskbarWidget
+
+        self.directory = tempfile.mkdtemp(prefix="nsw-bench-")
+        settings_file = os.path.join(self.directory, "settings.json")
+        with open(settings_file, "w") as f:
+            json.dump(BENCHMARK_SETTINGS, f)
+
+        # Skip NetworkTaskbarWidget.__init__, which would start monitoring
+        self.widget = NetworkTaskbarWidget.__new__(NetworkTaskbarWidget)
+        super(NetworkTaskbarWidget, self.widget).__init__(settings_file)
+        self.widget.create_tray_icon()
+        self.listener = LoopbackListener()
+
+    def close(self):
+        widget = self.widget
+        widget.streaming_ping.stop()
+        widget.settings_store.close()
+        widget.close()
+        self.listener.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def benchmarks(fixture):
+    """Return {name: operation}; each operation is a zero-argument callable"""
+    from network_probes import classify_response_time
+
+    widget = fixture.widget
+    settings = widget.settings
+
+    def check_icmp():
+        settings["probe_mode"] = "icmp"
+        widget.check_network_status()
+
+    def check_tcp():
+        settings["probe_mode"] = "tcp"
+        settings["ping_host"] = f"127.0.0.1:{fixture.listener.port}"
+        try:
+            widget.check_network_status()
+        finally:
+            settings["ping_host"] = BENCHMARK_SETTINGS["ping_host"]
+
+    def classify():
+        for sample in LADDER_SAMPLES:
+            if sample is not None:
+                classify_response_time(sample)
+
+    def smooth():
+        for sample in LADDER_SAMPLES:
+            widget.signal_smoother.update(sample)
+
+    states = [
+        (bars, status)
+        for status in widget.STATUS_COLORS
+        for bars in range(settings["signal_bars"] + 1)
+    ]
+
+    def render_icons():
+        for bars, status in states:
+            widget.create_signal_icon(bars, status)
+
+    # One tray update per state, so every update changes the icon or tooltip
+    tray_states = [(bars, status) for bars, status in states if status != "unknown"]
+    cursor = [0]
+
+    def update_changing():
+        bars, status = tray_states[cursor[0] % len(tray_states)]
+        cursor[0] += 1
+        widget.current_signal_strength = bars
+        widget.current_status = status
+        widget.last_response_time = 20.0 + cursor[0] % 7
+        widget.update_tray_icon()
+
+    def update_steady():
+        widget.current_signal_strength = 6
+        widget.current_status = "good"
+        widget.last_response_time = 20.0
+        widget.update_tray_icon()
+
+    return {
+        "check_network_status_icmp": check_icmp,
+        "check_network_status_tcp": check_tcp,
+        "classify_ladder": classify,
+        "signal_smoother_ladder": smooth,
+        "create_signal_icon_all_states": render_icons,
+        "update_tray_icon_changing": update_changing,
+        "update_tray_icon_steady": update_steady,
+    }
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(operation, seconds, rounds=5):
+    """Time `operation` for about `seconds`, then trace its allocations
+
+    The time is split into rounds and the latencies of the quietest round are
+    reported, so one burst of load from elsewhere on the machine does not
+    read as a regression.
+    """
+    for _ in range(10):  # Warm caches, sockets and lazy imports
+        operation()
+
+    clock = time.perf_counter_ns
+    ops = total = 0
+    best = None
+    for _ in range(rounds):
+        durations = []
+        deadline = clock() + int(seconds / rounds * 1e9)
+        while True:
+            start = clock()
+            operation()
+            end = clock()
+            durations.append(end - start)
+            if end >= deadline and len(durations) >= 20:
+                break
+        durations.sort()
+        ops += len(durations)
+        total += sum(durations)
+        latencies = (percentile(durations, 0.5), percentile(durations, 0.99))
+        if best is None or latencies < best:
+            best = latencies
+
+    peak_bytes = retained_bytes = 0
+    tracemalloc.start()
+    try:
+        for _ in range(ALLOCATION_OPS):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            operation()
+            current, peak = tracemalloc.get_traced_memory()
+            peak_bytes += peak - before
+            retained_bytes += current - before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops": ops,
+        "ops_per_sec": ops / (total / 1e9) if total else float("inf"),
+        "median_us": best[0] / 1000,
+        "p99_us": best[1] / 1000,
+        "alloc_bytes_per_op": peak_bytes / ALLOCATION_OPS,
+        "retained_bytes_per_op": retained_bytes / ALLOCATION_OPS,
+    }
+
+
+def regressions(results, baseline, threshold, alloc_threshold):
+    """Yield a message for every benchmark that got worse than the thresholds allow"""
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        # The median only: ops/sec and p99 swing with one stalled operation or
+        # a busy neighbour, and p99 is reported for reading, not for gating
+        if result["median_us"] > base["median_us"] * (1 + threshold):
+            yield (
+                f"{name}: median {result['median_us']:.1f}us,"
+                f" baseline {base['median_us']:.1f}us"
+            )
+        # A little slack so a few bytes of noise on tiny operations do not fail
+        limit = base["alloc_bytes_per_op"] * (1 + alloc_threshold) + 256
+        if result["alloc_bytes_per_op"] > limit:
+            yield (
+                f"{name}: {result['alloc_bytes_per_op']:.0f} bytes allocated per op,"
+                f" baseline {base['alloc_bytes_per_op']:.0f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the widget's hot paths")
+    parser.add_argument(
+        "--seconds", type=float, default=1.0, help="timed run length per benchmark"
+    )
+    parser.add_argument(
+        "--only", action="append", metavar="NAME", help="run benchmarks containing NAME"
+    )
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    parser.add_argument(
+        "--check", action="store_true", help="exit with status 1 on a regression"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.0,
+        help="allowed median slowdown for --check (default 1.0, twice as slow)",
+    )
+    parser.add_argument(
+        "--alloc-threshold",
+        type=float,
+        default=0.1,
+        help="allowed growth of bytes allocated per operation (default 0.1)",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help=f"write the results to {BASELINE_FILE}"
+    )
+    args = parser.parse_args()
+
+    fixture = Fixture()
+    results = {}
+    try:
+        print(
+            f"{'benchmark':32} {'ops/sec':>10} {'median':>10} {'p99':>10}"
+            f" {'alloc/op':>10} {'kept/op':>9}"
+        )
+        for name, operation in benchmarks(fixture).items():
+            if args.only and not any(part in name for part in args.only):
+                continue
+            result = measure(operation, args.seconds)
+            results[name] = result
+            print(
+                f"{name:32} {result['ops_per_sec']:10.0f}"
+                f" {result['median_us']:8.1f}us {result['p99_us']:8.1f}us"
+                f" {result['alloc_bytes_per_op']:9.0f}B"
+                f" {result['retained_bytes_per_op']:8.0f}B"
+            )
+    finally:
+        fixture.close()
+
+    report = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "benchmarks": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {BASELINE_FILE}")
+
+    if args.check:
+        try:
+            with open(BASELINE_FILE, "r") as f:
+                baseline = json.load(f)["benchmarks"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"\nNo usable baseline: {e}")
+            sys.exit(1)
+        problems = list(
+            regressions(results, baseline, args.threshold, args.alloc_threshold)
+        )
+        if problems:
+            print("\nRegressions:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
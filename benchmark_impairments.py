@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+"""
+Loopback impairment benchmark for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Starts thousands of echo, UDP, TCP or HTTP responders on loopback, each with
+its own latency distribution, jitter, loss rate and blackhole windows, and
+probes all of them every cycle the way the widget probes its targets. Reports
+probe throughput, how late the scheduler started each cycle, and how often the
+bars and status the widget would show match the delay that was injected.
+
+Usage:
+    python benchmark_impairments.py [--protocol echo|udp|tcp|http] [--count 2000]
+        [--duration 30] [--interval 5] [--timeout 3] [--workers 512]
+        [--spread] [--seed 1] [--json results.json]
+
+Echo responders (the default) are probed through MultiTargetEngine exactly as
+the widget probes its `targets` in ICMP mode. Loopback ICMP is answered by the
+kernel and cannot be impaired, so the engine is handed a UDP socket in place
+of its ICMP socket and each echo travels as a datagram. UDP responders answer
+DNS-shaped queries and are probed with the widget's DnsProber, HTTP responders
+with its keep-alive HttpProber. A TCP handshake is answered by the kernel too,
+so TCP responders echo a line and are timed by that round trip.
+Responders run in a child process so their work does not skew the driver's
+scheduling. --spread binds each responder to its own 127.x.y.z address
+(Linux only) instead of its own port on 127.0.0.1.
+
+Every impairment decision is drawn from a generator seeded by the responder
+and probe number, so the driver knows the ground truth without asking.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import queue
+import random
+import socket
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from network_dns import DnsProber, build_dns_query, dns_header, skip_dns_name
+from network_engine import MultiTargetEngine
+from network_probes import HttpProber, classify_response_time
+from network_scheduler import ProbeScheduler
+
+
+DISTRIBUTIONS = ("constant", "uniform", "normal", "pareto")
+
+# Injected latencies (ms), one inside each rung of the classification ladder
+LATENCY_LEVELS = (20, 75, 150, 350, 750, 1500, 2500)
+LOSS_LEVELS = (0.0, 0.0, 0.02, 0.1)
+
+# Probes sent this close (seconds) to a blackhole edge have no reliable truth
+EDGE_MARGIN = 0.05
+
+
+class Impairment:
+    """How one responder mistreats the probes it receives"""
+
+    def __init__(self, latency, jitter=0.0, distribution="constant", loss=0.0, blackholes=()):
+        self.latency = latency  # ms
+        self.jitter = jitter  # ms, spread of the distribution
+        self.distribution = distribution
+        self.loss = loss  # Chance of dropping each probe
+        self.blackholes = tuple(blackholes)  # (start, end) seconds into the run
+
+    def blackholed(self, elapsed):
+        return any(start <= elapsed < end for start, end in self.blackholes)
+
+    def near_edge(self, elapsed):
+        return any(
+            abs(elapsed - edge) < EDGE_MARGIN
+            for window in self.blackholes
+            for edge in window
+        )
+
+    def draw(self, rng):
+        """One delay in ms from the latency distribution"""
+        if self.distribution == "uniform":
+            delay = self.latency + rng.uniform(-self.jitter, self.jitter)
+        elif self.distribution == "normal":
+            delay = rng.gauss(self.latency, self.jitter)
+        elif self.distribution == "pareto":
+            # Long tail above the base latency, like a congested queue
+            delay = self.latency + self.jitter * (rng.paretovariate(3) - 1)
+        else:
+            delay = self.latency
+        return max(delay, 0.0)
+
+
+class ImpairmentPlan:
+    """Impairments for every responder, shared by the responders and the driver"""
+
+    def __init__(self, count, duration, seed=1):
+        self.seed = seed
+        self.start = 0.0  # Wall-clock start of the run, set once responders are up
+        self.profiles = []
+        for index in range(count):
+            latency = LATENCY_LEVELS[index % len(LATENCY_LEVELS)]
+            blackholes = ()
+            if index % 10 == 3:
+                # Every tenth responder goes dark for part of the run
+                blackholes = ((duration * 0.3, duration * 0.45),)
+            self.profiles.append(
+                Impairment(
+                    latency,
+                    latency * 0.1,
+                    DISTRIBUTIONS[index // len(LATENCY_LEVELS) % len(DISTRIBUTIONS)],
+                    LOSS_LEVELS[index % len(LOSS_LEVELS)],
+                    blackholes,
+                )
+            )
+
+    def decide(self, index, probe_id, now):
+        """Delay in ms to answer a probe after, or None to drop it"""
+        profile = self.profiles[index]
+        if profile.blackholed(now - self.start):
+            return None
+        rng = random.Random((self.seed * 1_000_003 + index) * 1_000_003 + probe_id)
+        if rng.random() < profile.loss:
+            return None
+        return profile.draw(rng)
+
+
+def responder_address(index, spread):
+    """Loopback address for a responder: its own 127.x.y.z, or 127.0.0.1"""
+    if not spread:
+        return "127.0.0.1"
+    index += 1
+    return f"127.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+
+
+def dns_probe_id(data):
+    """Probe number from a query for "p<id>.r<index>.sim", or None"""
+    offset = dns_header.size
+    length = data[offset]
+    label = data[offset + 1 : offset + 1 + length]
+    skip_dns_name(data, offset)  # Raises on a truncated name
+    if not label.startswith(b"p") or not label[1:].isdigit():
+        return None
+    return int(label[1:])
+
+
+class UdpResponder(asyncio.DatagramProtocol):
+    """Answer DNS-shaped queries with an empty NOERROR response, impaired"""
+
+    def __init__(self, plan, index):
+        self.plan = plan
+        self.index = index
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        try:
+            probe_id = dns_probe_id(data)
+        except (IndexError, struct.error):
+            return
+        if probe_id is None:
+            return
+        delay = self.plan.decide(self.index, probe_id, time.time())
+        if delay is None:
+            return
+        # Same header and question with the response and recursion-available bits
+        query_id, flags = struct.unpack_from("!HH", data)
+        response = struct.pack("!HH", query_id, flags | 0x8080) + data[4:]
+        asyncio.get_running_loop().call_later(
+            delay / 1000, self.transport.sendto, response, address
+        )
+
+
+def reply(writer, data):
+    """Send a delayed answer unless the prober gave up and hung up meanwhile"""
+    if not writer.is_closing():
+        writer.write(data)
+
+
+async def serve_tcp(plan, index, reader, writer):
+    """Echo each "<id>\\n" line after its injected delay, or swallow it"""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                probe_id = int(line)
+            except ValueError:
+                break
+            delay = plan.decide(index, probe_id, time.time())
+            if delay is not None:
+                loop.call_later(delay / 1000, reply, writer, line)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_http(plan, index, reader, writer):
+    """Answer keep-alive GET /probe?id=N requests after their injected delay"""
+    loop = asyncio.get_running_loop()
+    response = (
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+        b"Content-Length: 2\r\nConnection: keep-alive\r\n\r\nok"
+    )
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            target = head.split(b" ", 2)[1]
+            _, _, probe_id = target.partition(b"id=")
+            if not probe_id.isdigit():
+                break
+            delay = plan.decide(index, int(probe_id), time.time())
+            if delay is not None:
+                loop.call_later(delay / 1000, reply, writer, response)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, IndexError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_responders(plan, protocol, spread):
+    """Bind one responder per profile and return their (address, port) list"""
+    loop = asyncio.get_running_loop()
+    endpoints = []
+    for index in range(len(plan.profiles)):
+        host = responder_address(index, spread)
+        if protocol in ("echo", "udp"):
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda index=index: UdpResponder(plan, index), local_addr=(host, 0)
+            )
+            endpoints.append(transport.get_extra_info("sockname")[:2])
+            continue
+        handler = serve_tcp if protocol == "tcp" else serve_http
+        server = await asyncio.start_server(
+            lambda reader, writer, index=index: handler(plan, index, reader, writer),
+            host,
+            0,
+            backlog=64,
+        )
+        endpoints.append(server.sockets[0].getsockname()[:2])
+    return endpoints
+
+
+def run_responders(plan, protocol, spread, connection):
+    """Child process: serve every responder until the parent closes the pipe"""
+    raise_file_limit()
+
+    async def main():
+        endpoints = await start_responders(plan, protocol, spread)
+        connection.send(endpoints)
+        loop = asyncio.get_running_loop()
+        start = await loop.run_in_executor(None, connection.recv)
+        plan.start = start
+        await loop.run_in_executor(None, connection.recv)  # EOF at shutdown
+
+    try:
+        asyncio.run(main())
+    except (EOFError, KeyboardInterrupt):
+        pass
+
+
+def raise_file_limit():
+    """Allow as many open sockets as the system permits"""
+    try:
+        import resource
+    except ImportError:
+        return  # Windows has no descriptor limit to raise
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+class TcpEchoTarget:
+    """Persistent connection to one TCP responder, timed by a line echo"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.sock = None
+        self.buffer = b""
+
+    def probe(self, probe_id, timeout):
+        try:
+            if self.sock is None:
+                self.sock = socket.create_connection(self.endpoint, timeout)
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.buffer = b""
+            self.sock.settimeout(timeout)
+            line = b"%d\n" % probe_id
+            start = time.perf_counter_ns()
+            self.sock.sendall(line)
+            while not self.buffer.endswith(b"\n"):
+                data = self.sock.recv(64)
+                if not data:
+                    raise ConnectionError("responder closed the connection")
+                self.buffer += data
+            received = time.perf_counter_ns()
+            echoed, self.buffer = self.buffer, b""
+            if echoed != line:
+                raise ConnectionError("echo out of order")
+            return (received - start) / 1_000_000
+        except OSError:
+            # A dropped probe may still be echoed later; start afresh next time
+            self.close()
+            return None
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class UdpEchoSocket:
+    """Stands in for IcmpProber under MultiTargetEngine, over UDP
+
+    Each echo is a DNS-shaped query for "p<probe id>.sim" whose query ID is
+    the echo's sequence number, and replies are matched by (host, port)
+    and that ID, as the engine matches ICMP replies by address and sequence.
+    """
+
+    available = True
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sequence = 0
+        self.probe_id = 0  # Set by the driver before each cycle
+
+    def send_echo(self, address):
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        packet = build_dns_query(f"p{self.probe_id}.sim", self.sequence)
+        sent = time.perf_counter_ns()
+        self.sock.sendto(packet, address)
+        return self.sequence, sent
+
+    def read_replies(self):
+        while True:
+            try:
+                data, source = self.sock.recvfrom(512)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                continue  # Windows reports an ICMP port unreachable as a reset
+            received = time.perf_counter_ns()
+            if len(data) >= dns_header.size:
+                yield source[:2], struct.unpack_from("!H", data)[0], received
+
+    def close(self):
+        self.sock.close()
+
+
+class EndpointResolver:
+    """Resolver for MultiTargetEngine that maps "host:port" targets to (host, port)"""
+
+    def __init__(self, endpoints):
+        self.endpoints = {target_name(endpoint): endpoint for endpoint in endpoints}
+
+    def cached(self, host):
+        return self.endpoints[host]
+
+
+def target_name(endpoint):
+    return f"{endpoint[0]}:{endpoint[1]}"
+
+
+class Driver:
+    """Probe every responder once per cycle with the widget's probers"""
+
+    def __init__(self, plan, protocol, endpoints, timeout, workers):
+        self.plan = plan
+        self.protocol = protocol
+        self.endpoints = endpoints
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="probe")
+        self.dns_probers = queue.Queue()
+        if protocol == "udp":
+            # DnsProber waits with select(), so create its sockets while
+            # descriptor numbers are still low
+            for _ in range(workers):
+                self.dns_probers.put(DnsProber())
+        self.http_probers = (
+            [HttpProber(quiet=True) for _ in endpoints] if protocol == "http" else []
+        )
+        self.tcp_targets = [TcpEchoTarget(e) for e in endpoints] if protocol == "tcp" else []
+        self.engine = None
+        if protocol == "echo":
+            self.echo_socket = UdpEchoSocket()
+            self.engine = MultiTargetEngine(
+                self.echo_socket, workers, EndpointResolver(endpoints), quiet=True
+            )
+            self.targets = [target_name(endpoint) for endpoint in endpoints]
+        self.probe_id = 0
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        if self.engine is not None:
+            self.engine.close()
+            self.echo_socket.close()
+        while not self.dns_probers.empty():
+            self.dns_probers.get().close()
+        for prober in self.http_probers:
+            prober.close()
+        for target in self.tcp_targets:
+            target.close()
+
+    def probe(self, index, probe_id):
+        """Return (send time, RTT in ms or None) for one responder"""
+        sent = time.time()
+        host, port = self.endpoints[index]
+        if self.protocol == "udp":
+            prober = self.dns_probers.get()
+            try:
+                answer = prober.query(
+                    f"p{probe_id}.r{index}.sim", host, self.timeout, port
+                )
+            finally:
+                self.dns_probers.put(prober)
+            return sent, None if answer is None else answer.rtt
+        if self.protocol == "http":
+            timing = self.http_probers[index].probe(
+                f"http://{host}:{port}/probe?id={probe_id}", self.timeout
+            )
+            return sent, None if timing is None else timing.total
+        return sent, self.tcp_targets[index].probe(probe_id, self.timeout)
+
+    def cycle(self):
+        """Probe every responder at once; return [(index, probe id, sent, rtt)]"""
+        self.probe_id += 1
+        probe_id = self.probe_id
+        if self.engine is not None:
+            return self.engine_cycle(probe_id)
+        futures = [
+            (index, self.pool.submit(self.probe, index, probe_id))
+            for index in range(len(self.endpoints))
+        ]
+        return [(index, probe_id) + future.result() for index, future in futures]
+
+    def engine_cycle(self, probe_id):
+        """One MultiTargetEngine.probe over every responder, as the widget runs it"""
+        self.echo_socket.probe_id = probe_id
+        sent = time.time()
+        results = self.engine.probe(self.targets, self.timeout)
+        return [
+            (index, probe_id, sent, result.response_time if result.bars else None)
+            for index, result in enumerate(results[target] for target in self.targets)
+        ]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Tally:
+    """Accuracy of the observed results against the injected ground truth"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.probes = 0
+        self.status_matches = 0
+        self.bar_matches = 0
+        self.judged = 0
+        self.unclear = 0  # Sent next to a blackhole edge
+        self.false_losses = 0  # Answered in time by the responder, lost by the driver
+        self.false_replies = 0  # Dropped by the responder, answered anyway
+        self.errors = []  # Measured minus injected RTT, ms
+
+    def add(self, plan, index, probe_id, sent, rtt):
+        self.probes += 1
+        if plan.profiles[index].near_edge(sent - plan.start):
+            self.unclear += 1
+            return
+        injected = plan.decide(index, probe_id, sent)
+        if injected is not None and injected >= self.timeout * 1000:
+            injected = None  # Too slow to arrive before the timeout
+        if injected is None:
+            expected_result = (0, "no_connection")
+        else:
+            expected_result = classify_response_time(injected)
+
+        observed = (0, "no_connection") if rtt is None else classify_response_time(rtt)
+        self.judged += 1
+        self.status_matches += observed[1] == expected_result[1]
+        self.bar_matches += observed == expected_result
+        if injected is not None and rtt is None:
+            self.false_losses += 1
+        elif injected is None and rtt is not None:
+            self.false_replies += 1
+        elif rtt is not None:
+            self.errors.append(rtt - injected)
+
+    def report(self):
+        judged = self.judged or 1
+        return {
+            "probes": self.probes,
+            "judged": self.judged,
+            "unclear": self.unclear,
+            "status_accuracy": self.status_matches / judged,
+            "bars_accuracy": self.bar_matches / judged,
+            "false_losses": self.false_losses,
+            "false_replies": self.false_replies,
+            "rtt_error_p50_ms": percentile(self.errors, 0.5),
+            "rtt_error_p99_ms": percentile(self.errors, 0.99),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe loopback responders with injected impairments")
+    parser.add_argument("--protocol", choices=("echo", "udp", "tcp", "http"), default="echo")
+    parser.add_argument("--count", type=int, default=2000, help="responders to start")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to probe for")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between cycles")
+    parser.add_argument("--timeout", type=float, default=3, help="probe timeout in seconds")
+    parser.add_argument("--workers", type=int, default=512, help="probes in flight at once")
+    parser.add_argument("--spread", action="store_true", help="one 127.x.y.z address per responder")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the impairment draws")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    args = parser.parse_args()
+
+    if args.spread and not sys.platform.startswith("linux"):
+        parser.error("--spread needs all of 127.0.0.0/8 on loopback, as on Linux")
+    raise_file_limit()
+
+    plan = ImpairmentPlan(args.count, args.duration, args.seed)
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=run_responders, args=(plan, args.protocol, args.spread, child), daemon=True
+    )
+    process.start()
+    child.close()
+    started = time.perf_counter()
+    endpoints = parent.recv()
+    print(
+        f"{len(endpoints)} {args.protocol} responders up in"
+        f" {time.perf_counter() - started:.1f}s"
+    )
+
+    driver = Driver(plan, args.protocol, endpoints, args.timeout, args.workers)
+    scheduler = ProbeScheduler(args.interval)
+    tally = Tally(args.timeout)
+    lateness = []
+    cycle_times = []
+    plan.start = time.time()
+    parent.send(plan.start)
+    deadline = time.monotonic() + args.duration
+    try:
+        while True:
+            cycle_start = time.perf_counter()
+            for index, probe_id, sent, rtt in driver.cycle():
+                tally.add(plan, index, probe_id, sent, rtt)
+            cycle_times.append(time.perf_counter() - cycle_start)
+            scheduler.cycle_done()
+            print(
+                f"  cycle {len(cycle_times):3}: {cycle_times[-1]:6.2f}s,"
+                f" started {scheduler.lateness * 1000:7.1f}ms late"
+            )
+            if time.monotonic() >= deadline:
+                break
+            scheduler.wait()
+            lateness.append(scheduler.lateness)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        driver.close()
+        parent.close()
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+    elapsed = time.time() - plan.start
+    results = {
+        "protocol": args.protocol,
+        "responders": len(endpoints),
+        "cycles": len(cycle_times),
+        "throughput_per_sec": tally.probes / elapsed if elapsed else 0.0,
+        "cycle_time_p50_s": percentile(cycle_times, 0.5),
+        "cycle_time_max_s": max(cycle_times, default=None),
+        "overruns": sum(t > args.interval for t in cycle_times),
+        "lateness_p50_ms": None if not lateness else percentile(lateness, 0.5) * 1000,
+        "lateness_p99_ms": None if not lateness else percentile(lateness, 0.99) * 1000,
+        "lateness_max_ms": None if not lateness else max(lateness) * 1000,
+        **tally.report(),
+    }
+
+    print()
+    print(f"Throughput: {results['throughput_per_sec']:.0f} probes/sec over {elapsed:.1f}s")
+    print(
+        f"Cycle time: median {results['cycle_time_p50_s']:.2f}s,"
+        f" max {results['cycle_time_max_s']:.2f}s,"
+        f" {results['overruns']} of {results['cycles']} over the {args.interval:g}s interval"
+    )
+    if lateness:
+        print(
+            f"Scheduler lag: median {results['lateness_p50_ms']:.1f}ms,"
+            f" p99 {results['lateness_p99_ms']:.1f}ms, max {results['lateness_max_ms']:.1f}ms"
+        )
+    print(
+        f"Accuracy: status {results['status_accuracy']:.1%},"
+        f" bars {results['bars_accuracy']:.1%} of {results['judged']} probes"
+        f" ({results['unclear']} next to a blackhole edge not judged)"
+    )
+    print(
+        f"Losses: {results['false_losses']} replies the driver missed,"
+        f" {results['false_replies']} answers to dropped probes"
+    )
+    if results["rtt_error_p50_ms"] is not None:
+        print(
+            f"RTT over injected delay: median {results['rtt_error_p50_ms']:.2f}ms,"
+            f" p99 {results['rtt_error_p99_ms']:.2f}ms"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
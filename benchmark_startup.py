@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Measures how long the widget takes to show its tray icon when run from source,
+from the onedir build and from the onefile build (whichever exist), and where
+source startup spends its import time according to `python -X importtime`.
+
+Usage:
+    python benchmark_startup.py [--runs 5] [--top 15] [--json results.json]
+
+Build the executables first with `python build_exe.py --profile onedir` and
+`python build_exe.py`. Frozen builds cannot be run under -X importtime, so for
+them the number of loaded modules at first icon is reported instead.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+EXE_SUFFIX = ".exe" if sys.platform == "win32" else ""
+
+# What the tray startup path imports before the icon can appear
+STARTUP_IMPORTS = "import taskbar_network_widget, pystray, PIL.ImageDraw"
+
+
+def build_commands():
+    """Return {name: command} for every way of starting the widget that exists"""
+    commands = {"source": [sys.executable, "taskbar_network_widget.py"]}
+    builds = {
+        "onedir": os.path.join(
+            "dist", "NetworkStatusWidget", "NetworkStatusWidget" + EXE_SUFFIX
+        ),
+        "onefile": os.path.join("dist", "NetworkStatusWidget" + EXE_SUFFIX),
+    }
+    for name, path in builds.items():
+        path = os.path.join(PROJECT_DIR, path)
+        if os.path.isfile(path):
+            commands[name] = [path]
+    return commands
+
+
+def import_profile(code=STARTUP_IMPORTS):
+    """Run `code` under -X importtime and return (total_us, [(self_us, cumulative_us, module)])"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Column header
+        self_us, cumulative_us = int(fields[0]), int(fields[1])
+        name = fields[2].rstrip()
+        if not name.startswith("  "):
+            total += cumulative_us  # Top-level imports only, nested ones are included
+        modules.append((self_us, cumulative_us, name.strip()))
+    return total, modules
+
+
+def time_to_tray(command, timeout=60):
+    """Start the widget once and return (seconds until the icon appeared, modules loaded)"""
+    fd, mark = tempfile.mkstemp(suffix=".json", prefix="nsw-startup-")
+    os.close(fd)
+    os.remove(mark)
+    try:
+        start = time.time()
+        process = subprocess.Popen(
+            command + ["--startup-mark", mark],
+            cwd=PROJECT_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+        )
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise RuntimeError("tray icon did not appear")
+        try:
+            with open(mark, "r") as f:
+                ready = json.load(f)
+        except (OSError, ValueError):
+            raise RuntimeError(f"exited with code {process.returncode} before the icon appeared")
+        return ready["time"] - start, ready["modules"]
+    finally:
+        if os.path.exists(mark):
+            os.remove(mark)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark widget startup time")
+    parser.add_argument("--runs", type=int, default=5, help="launches per build")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "platform": sys.platform}
+
+    widget_total, _ = import_profile("import taskbar_network_widget")
+    print(f"Import time of taskbar_network_widget alone: {widget_total / 1000:.1f}ms")
+    results["widget_import_time_ms"] = widget_total / 1000
+
+    print(f"Import time ({STARTUP_IMPORTS}):")
+    try:
+        total, modules = import_profile()
+    except RuntimeError as e:
+        print(f"  failed: {e}")
+    else:
+        print(f"  total: {total / 1000:.1f}ms, slowest {args.top} by self time:")
+        slowest = sorted(modules, reverse=True)[: args.top]
+        for self_us, cumulative_us, name in slowest:
+            print(f"    {self_us / 1000:8.1f}ms  {cumulative_us / 1000:8.1f}ms  {name}")
+        results["import_time_ms"] = total / 1000
+        results["slowest_imports"] = [
+            {"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+            for self_us, cumulative_us, name in slowest
+        ]
+
+    print()
+    print(f"Time to first tray icon ({args.runs} runs):")
+    results["time_to_tray"] = {}
+    for name, command in build_commands().items():
+        times = []
+        modules = None
+        try:
+            for _ in range(args.runs):
+                elapsed, modules = time_to_tray(command)
+                times.append(elapsed)
+        except (OSError, RuntimeError) as e:
+            print(f"  {name:8} failed: {e}")
+            continue
+        print(
+            f"  {name:8} median {statistics.median(times) * 1000:7.0f}ms"
+            f"  min {min(times) * 1000:7.0f}ms  max {max(times) * 1000:7.0f}ms"
+            f"  ({modules} modules)"
+        )
+        results["time_to_tray"][name] = {
+            "median_ms": statistics.median(times) * 1000,
+            "min_ms": min(times) * 1000,
+            "max_ms": max(times) * 1000,
+            "modules": modules,
+        }
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ Website: mrbean.dev
 GitHub: github.com/mrbeandev
 """
 
+import argparse
 import subprocess
 import sys
 import os
@@ -28,9 +29,40 @@ def install_pyinstaller():
             print(f"[ERROR] Failed to install PyInstaller: {e}")
             return False
 
-def create_spec_file():
+# Modules the frozen widget never imports, but that its dependencies can pull in
+# during analysis. Tk itself stays: the dialogs load it on first use.
+EXCLUDES = [
+    'requests',
+    'urllib3',
+    'numpy',
+    'PIL.ImageQt',
+    'PIL.ImageTk',
+    'PIL.ImageShow',
+    'PIL.ImageGrab',
+    'tkinter.simpledialog',
+    'tkinter.tix',
+    'tkinter.test',
+    'unittest',
+    'doctest',
+    'pydoc',
+    'pdb',
+    'lib2to3',
+    'distutils',
+    'setuptools',
+    'pkg_resources',
+    'xmlrpc',
+    'sqlite3',
+]
+
+# onefile - a single EXE that unpacks itself to a temp directory on every launch
+# onedir  - a folder with loose .pyc files (noarchive) and no UPX, which starts
+#           fastest because nothing is extracted or decompressed at launch
+BUILD_PROFILES = ('onefile', 'onedir')
+
+def create_spec_file(profile='onefile'):
     """Create a custom spec file for better executable configuration"""
-    spec_content = '''# -*- mode: python ; coding: utf-8 -*-
+    onedir = profile == 'onedir'
+    spec_content = f'''# -*- mode: python ; coding: utf-8 -*-
 
 block_cipher = None
 
@@ -40,39 +72,29 @@ a = Analysis(
     binaries=[],
     datas=[],
     hiddenimports=[
-        'PIL._tkinter_finder',
+        'network_dialogs',
         'tkinter',
         'tkinter.messagebox',
-        'tkinter.simpledialog',
         'pystray._win32',
-        'requests.packages.urllib3',
     ],
     hookspath=[],
-    hooksconfig={},
+    hooksconfig={{}},
     runtime_hooks=[],
-    excludes=[],
+    excludes={EXCLUDES!r},
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
-    noarchive=False,
+    noarchive={onedir},
 )
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='NetworkStatusWidget',
+'''
+    exe_options = '''    name='NetworkStatusWidget',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx={upx},
     upx_exclude=[],
-    runtime_tmpdir=None,
     console=False,  # No console window
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -80,12 +102,49 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
     icon=None,  # You can add an .ico file path here if you have one
+'''.format(upx=not onedir)
+    if onedir:
+        spec_content += f'''
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+{exe_options})
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='NetworkStatusWidget',
 )
 '''
-    
+    else:
+        spec_content += f'''
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    [],
+    runtime_tmpdir=None,
+{exe_options})
+'''
+
     with open('network_widget.spec', 'w') as f:
         f.write(spec_content)
-    print("[OK] Created custom spec file")
+    print(f"[OK] Created custom spec file ({profile})")
+
+def executable_path(profile='onefile'):
+    """Where PyInstaller puts the executable for a build profile"""
+    if profile == 'onedir':
+        return os.path.join('dist', 'NetworkStatusWidget', 'NetworkStatusWidget.exe')
+    return os.path.join('dist', 'NetworkStatusWidget.exe')
 
 def build_executable():
     """Build the executable using PyInstaller"""
@@ -130,7 +189,7 @@ def cleanup_build_files():
         os.remove('network_widget.spec')
         print("[OK] Removed spec file")
 
-def create_startup_script():
+def create_startup_script(profile='onefile'):
     """Create a script to add the exe to Windows startup"""
     startup_script = '''@echo off
 setlocal enabledelayedexpansion
@@ -190,12 +249,27 @@ echo.
 pause
 '''
     
+    if profile == 'onedir':
+        startup_script = startup_script.replace(
+            'dist\\NetworkStatusWidget.exe', 'dist\\NetworkStatusWidget\\NetworkStatusWidget.exe'
+        ).replace("%~dp0dist'", "%~dp0dist\\NetworkStatusWidget'")
+
     with open('add_to_startup.bat', 'w') as f:
         f.write(startup_script)
     print("[OK] Created startup script: add_to_startup.bat")
 
 def main():
     """Main build process"""
+    parser = argparse.ArgumentParser(description="Build the Network Status Widget executable")
+    parser.add_argument(
+        "--profile",
+        choices=BUILD_PROFILES,
+        default="onefile",
+        help="onefile for a single EXE, onedir for the fastest startup",
+    )
+    args = parser.parse_args()
+    exe_path = executable_path(args.profile)
+
     print("Network Status Widget - Build Script")
     print("Author: mrbeandev | Website: mrbean.dev")
     print("====================================")
@@ -228,19 +302,19 @@ def main():
             return False
         
         # Create spec file
-        create_spec_file()
+        create_spec_file(args.profile)
         
         # Build executable
         if not build_executable():
             return False
         
         # Verify executable was created
-        if not os.path.exists('dist/NetworkStatusWidget.exe'):
+        if not os.path.exists(exe_path):
             print("[ERROR] Executable was not created successfully!")
             return False
         
         # Create startup script
-        create_startup_script()
+        create_startup_script(args.profile)
         
         # Clean up
         cleanup_build_files()
@@ -249,11 +323,11 @@ def main():
         print("Build completed successfully!")
         print()
         print("Files created:")
-        print("  dist/NetworkStatusWidget.exe - The main executable")
+        print(f"  {exe_path} - The main executable")
         print("  add_to_startup.bat - Script to add to Windows startup")
         print()
         print("Next steps:")
-        print("1. Test the executable: dist/NetworkStatusWidget.exe")
+        print(f"1. Test the executable: {exe_path}")
         print("2. Add to startup: Run add_to_startup.bat as administrator")
         print("3. Or use ONE_CLICK_SETUP.bat for automatic setup")
         print()
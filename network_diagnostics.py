@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Self-diagnostics for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Per-cycle timings of the monitor's own work (probe, parse, icon render, tray
+update), scheduler lateness, thread count and memory, kept in fixed-size
+histograms, plus an on-demand profile of a few cycles. None of it exists
+until it is switched on, so a normal session pays only an `is None` check.
+"""
+
+import cProfile
+import ctypes
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+
+# Upper bounds of the timing buckets, in seconds
+TIME_BUCKETS = tuple(m * 10.0**e for e in range(-4, 1) for m in (1, 2.5, 5))  # 100us-5s
+THREAD_BUCKETS = (2, 4, 8, 16, 32, 64, 128, 256)
+RSS_BUCKETS = tuple(mb << 20 for mb in (16, 32, 64, 128, 256, 512, 1024, 2048))
+
+# What each cycle records, in the order the diagnostics view lists them
+CYCLE_STAGES = (
+    ("probe", "Probe"),
+    ("parse", "Parse and statistics"),
+    ("render", "Icon render"),
+    ("tray", "Tray update"),
+    ("lateness", "Scheduler lateness"),
+)
+
+
+class Histogram:
+    """Counts per fixed bucket plus count, sum and maximum; never grows"""
+
+    __slots__ = ("bounds", "counts", "count", "total", "maximum", "last")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket is everything above
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+        self.last = None
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of values"""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index == len(self.bounds):
+                    return self.maximum
+                return min(self.bounds[index], self.maximum)
+        return self.maximum
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+def linux_rss():
+    """Resident set size in bytes from /proc/self/statm"""
+    with open("/proc/self/statm", "r") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def windows_rss():
+    """Working set size in bytes from GetProcessMemoryInfo"""
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(
+        process, ctypes.byref(counters), counters.cb
+    ):
+        raise OSError("GetProcessMemoryInfo failed")
+    return counters.WorkingSetSize
+
+
+# Memory readers per platform; others can be registered here
+RSS_SOURCES = {
+    "linux": linux_rss,
+    "win32": windows_rss,
+}
+
+
+def current_rss():
+    """Resident memory of this process in bytes, or None where unknown"""
+    source = RSS_SOURCES.get(sys.platform)
+    if source is None:
+        return None
+    try:
+        return source()
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class CycleDiagnostics:
+    """Histograms of every stage of the monitor cycle"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.cycles = 0
+        self.stages = {stage: Histogram(TIME_BUCKETS) for stage, _ in CYCLE_STAGES}
+        self.threads = Histogram(THREAD_BUCKETS)
+        self.rss = Histogram(RSS_BUCKETS)
+
+    def record(self, stage, seconds):
+        """Add one timing in seconds to a stage's histogram"""
+        with self.lock:
+            self.stages[stage].add(seconds)
+
+    def cycle_done(self):
+        """Count a finished cycle and sample the thread count and memory"""
+        rss = current_rss()
+        with self.lock:
+            self.cycles += 1
+            self.threads.add(threading.active_count())
+            if rss is not None:
+                self.rss.add(rss)
+
+    def summary(self):
+        """Readable text of every histogram, for the diagnostics view"""
+        with self.lock:
+            minutes = (time.time() - self.started) / 60
+            lines = [f"{self.cycles} cycles recorded over {minutes:.0f} minutes", ""]
+            lines.append(
+                f"{'Stage':22} {'count':>6} {'mean':>9} {'p50':>9} {'p99':>9} {'max':>9}"
+            )
+            for stage, label in CYCLE_STAGES:
+                histogram = self.stages[stage]
+                if not histogram.count:
+                    lines.append(f"{label:22} {0:6}")
+                    continue
+                lines.append(
+                    f"{label:22} {histogram.count:6}"
+                    f" {format_seconds(histogram.mean):>9}"
+                    f" {format_seconds(histogram.quantile(0.5)):>9}"
+                    f" {format_seconds(histogram.quantile(0.99)):>9}"
+                    f" {format_seconds(histogram.maximum):>9}"
+                )
+            lines.append("")
+            if self.threads.count:
+                lines.append(
+                    f"Threads: {self.threads.last} now, {self.threads.maximum} at most"
+                )
+            if self.rss.count:
+                lines.append(
+                    f"Memory: {self.rss.last / 2**20:.1f} MB now,"
+                    f" {self.rss.maximum / 2**20:.1f} MB at most"
+                )
+            return "\n".join(lines)
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 0.001:
+        return f"{seconds * 1_000_000:.0f}us"
+    if seconds < 1:
+        return f"{seconds * 1000:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+class ProfileCapture:
+    """Profile the next few monitor cycles and write the stats to a file
+
+    resume() and pause() bracket each cycle on the monitor thread, so time
+    spent waiting for the next deadline does not show up. yappi also sees the
+    probe threads; cProfile sees only the monitor thread.
+    """
+
+    def __init__(self, cycles, path, profiler="cprofile"):
+        self.remaining = cycles
+        self.cycles = cycles
+        self.path = path
+        self.profiler = profiler
+        self.yappi = None
+        self.profile = None
+        if profiler == "yappi":
+            try:
+                import yappi
+
+                yappi.set_clock_type("wall")
+                self.yappi = yappi
+            except ImportError:
+                print("yappi is not installed, profiling with cProfile")
+                self.profiler = "cprofile"
+        if self.yappi is None:
+            self.profile = cProfile.Profile()
+
+    def resume(self):
+        if self.yappi is not None:
+            self.yappi.start()
+        else:
+            self.profile.enable()
+
+    def pause(self):
+        """Stop profiling for now; return True once every cycle is captured"""
+        if self.yappi is not None:
+            self.yappi.stop()
+        else:
+            self.profile.disable()
+        self.remaining -= 1
+        return self.remaining <= 0
+
+    def save(self):
+        """Write pstats-compatible output, readable with `python -m pstats`"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if self.yappi is not None:
+            self.yappi.get_func_stats().save(self.path, type="pstat")
+            self.yappi.clear_stats()
+        else:
+            self.profile.dump_stats(self.path)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Dialog windows for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Tk windows opened from the tray menu. The widget imports this module the first
+time a dialog opens, so tkinter is never loaded by a session that opens none.
+All of Tk lives on one UI thread: a single hidden root owns every dialog as a
+Toplevel, and other threads only post commands to its queue.
+"""
+
+import queue
+import tkinter as tk
+from tkinter import messagebox
+
+from network_monitor import ConnectionTest
+from network_probes import classify_response_time
+
+
+POLL_INTERVAL = 100  # ms between checks of the command queue
+TEST_POLL_INTERVAL = 50  # ms between checks for connection test results
+
+ABOUT_TEXT = """Network Status Widget v1.1
+
+A Windows taskbar widget that shows network connectivity status using signal bars.
+
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Features:
+• 6-bar signal strength indicator
+• Color-coded status (Green/Orange/Red)
+• Customizable ping intervals
+• Google DNS connectivity check
+• System tray integration
+
+Ping Host: 8.8.8.8 (Google DNS)
+
+This widget monitors your internet connection by pinging Google's DNS server (8.8.8.8) and displays the connection quality using colored signal bars in your system tray.
+
+Made with ❤️ for Windows users"""
+
+
+class DialogHost:
+    """Hidden Tk root running the command loop that shows every dialog
+
+    Commands are (method name, args) tuples; ("quit", ()) ends the loop.
+    Windows are hidden rather than destroyed when closed and reused on the
+    next open, so reopening a dialog costs a refresh, not a rebuild.
+    """
+
+    def __init__(self, widget, commands):
+        self.widget = widget
+        self.commands = commands
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.windows = {}
+        self.test = None  # The latest ConnectionTest
+
+    def run(self):
+        """Process commands until told to quit; call on the UI thread"""
+        self.root.after(POLL_INTERVAL, self.poll)
+        self.root.mainloop()
+        self.root.destroy()
+
+    def poll(self):
+        """Run every queued command, then check again shortly"""
+        while True:
+            try:
+                name, args = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            if name == "quit":
+                self.root.quit()
+                return
+            try:
+                getattr(self, name)(*args)
+            except Exception as e:
+                print(f"Error in dialog {name}: {e}")
+        self.root.after(POLL_INTERVAL, self.poll)
+
+    def window(self, key, title, width, height):
+        """Return (window, created), showing the existing window for key if any"""
+        window = self.windows.get(key)
+        if window is not None and window.winfo_exists():
+            window.deiconify()
+            window.lift()
+            window.focus_force()
+            return window, False
+
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        window.resizable(False, False)
+        window.protocol("WM_DELETE_WINDOW", window.withdraw)
+
+        # Center the window
+        x = (window.winfo_screenwidth() // 2) - (width // 2)
+        y = (window.winfo_screenheight() // 2) - (height // 2)
+        window.geometry(f"{width}x{height}+{x}+{y}")
+        window.focus_force()
+        self.windows[key] = window
+        return window, True
+
+    def add_buttons(self, window, save):
+        """Add OK/Cancel buttons, with Enter bound to save"""
+        button_frame = tk.Frame(window)
+        button_frame.pack(pady=10)
+
+        ok_btn = tk.Button(button_frame, text="OK", command=save, width=8)
+        ok_btn.pack(side=tk.LEFT, padx=5)
+
+        cancel_btn = tk.Button(
+            button_frame, text="Cancel", command=window.withdraw, width=8
+        )
+        cancel_btn.pack(side=tk.LEFT, padx=5)
+
+        # Bind Enter key to save
+        window.bind("<Return>", lambda e: save())
+
+    def show_text(self, key, title, text, width, height):
+        """Show read-only text with a Close button"""
+        window, created = self.window(key, title, width, height)
+        if created:
+            window.text_widget = tk.Text(window, wrap=tk.WORD, padx=10, pady=10)
+            window.text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+            close_btn = tk.Button(window, text="Close", command=window.withdraw, width=10)
+            close_btn.pack(pady=10)
+
+        text_widget = window.text_widget
+        text_widget.config(state=tk.NORMAL)
+        text_widget.delete("1.0", tk.END)
+        text_widget.insert(tk.END, text)
+        text_widget.config(state=tk.DISABLED)
+
+    def show_status(self):
+        """Show current network status"""
+        self.show_text("status", "Network Status", self.widget.status_message(), 400, 200)
+
+    def show_diagnostics(self):
+        """Show the per-cycle timing histograms"""
+        self.show_text(
+            "diagnostics", "Diagnostics", self.widget.diagnostics_message(), 520, 340
+        )
+
+    def show_about(self):
+        """Show about dialog"""
+        self.show_text("about", "About Network Status Widget", ABOUT_TEXT, 450, 300)
+
+    def show_setting(self, title, prompt, setting, parse, width=20):
+        """Ask for a setting value, validate it with `parse` and apply it"""
+        window, created = self.window(("setting", setting), title, 300, 150)
+        if created:
+            # Add label
+            label = tk.Label(window, text=prompt)
+            label.pack(pady=10)
+
+            # Add entry
+            window.entry_var = tk.StringVar()
+            window.entry = tk.Entry(window, textvariable=window.entry_var, width=width)
+            window.entry.pack(pady=5)
+
+            def save_value():
+                try:
+                    value = parse(window.entry_var.get())
+                except ValueError as e:
+                    messagebox.showerror("Error", str(e), parent=window)
+                    return
+                self.widget.settings[setting] = value
+                self.widget.apply_settings()
+                window.withdraw()
+
+            self.add_buttons(window, save_value)
+
+        window.entry_var.set(str(self.widget.settings[setting]))
+        window.entry.focus()
+
+    def show_adaptive_bounds(self):
+        """Ask for the fastest and slowest adaptive ping intervals"""
+        window, created = self.window("adaptive", "Adaptive Interval", 300, 200)
+        if created:
+            # Add labels and entries
+            min_label = tk.Label(window, text="Fastest interval when degraded (1-300):")
+            min_label.pack(pady=(10, 0))
+            window.min_var = tk.StringVar()
+            window.min_entry = tk.Entry(window, textvariable=window.min_var, width=20)
+            window.min_entry.pack(pady=5)
+
+            max_label = tk.Label(window, text="Slowest interval when stable (1-3600):")
+            max_label.pack()
+            window.max_var = tk.StringVar()
+            max_entry = tk.Entry(window, textvariable=window.max_var, width=20)
+            max_entry.pack(pady=5)
+
+            def save_bounds():
+                try:
+                    fastest = int(window.min_var.get())
+                    slowest = int(window.max_var.get())
+                except ValueError:
+                    messagebox.showerror("Error", "Please enter valid numbers", parent=window)
+                    return
+                if 1 <= fastest <= 300 and fastest <= slowest <= 3600:
+                    self.widget.settings["adaptive_min_interval"] = fastest
+                    self.widget.settings["adaptive_max_interval"] = slowest
+                    self.widget.apply_settings()
+                    window.withdraw()
+                else:
+                    messagebox.showerror(
+                        "Error",
+                        "Please enter 1-300 and 1-3600, fastest not above slowest",
+                        parent=window,
+                    )
+
+            self.add_buttons(window, save_bounds)
+
+        window.min_var.set(str(self.widget.settings["adaptive_min_interval"]))
+        window.max_var.set(str(self.widget.settings["adaptive_max_interval"]))
+        window.min_entry.focus()
+
+    def show_test(self):
+        """Probe the connection in the background and stream results into a window"""
+        window, created = self.window("test", "Connection Test", 380, 320)
+        if created:
+            # Add status label
+            window.status_label = tk.Label(window, pady=10)
+            window.status_label.pack()
+            window.status_color = window.status_label.cget("fg")
+
+            # One line per probe as its result arrives
+            window.result_text = tk.Text(window, height=8, width=44, wrap=tk.WORD)
+            window.result_text.pack(padx=10, fill=tk.BOTH, expand=True)
+
+            # Running min/avg/max and loss
+            window.summary_label = tk.Label(window, justify=tk.LEFT)
+            window.summary_label.pack(pady=5)
+
+            button_frame = tk.Frame(window)
+            button_frame.pack(pady=(0, 10))
+
+            count_label = tk.Label(button_frame, text="Probes:")
+            count_label.pack(side=tk.LEFT)
+            window.count_var = tk.StringVar(value=str(self.widget.settings["test_count"]))
+            count_box = tk.Spinbox(
+                button_frame, from_=1, to=100, width=4, textvariable=window.count_var
+            )
+            count_box.pack(side=tk.LEFT, padx=5)
+
+            window.run_btn = tk.Button(
+                button_frame, width=8, command=lambda: self.toggle_test(window)
+            )
+            window.run_btn.pack(side=tk.LEFT, padx=5)
+
+            def close_test():
+                if self.test is not None:
+                    self.test.cancel()
+                window.withdraw()
+
+            close_btn = tk.Button(button_frame, text="Close", command=close_test, width=8)
+            close_btn.pack(side=tk.LEFT, padx=5)
+            window.protocol("WM_DELETE_WINDOW", close_test)
+
+        if self.test is None or not self.test.running:
+            self.start_test(window)
+
+    def toggle_test(self, window):
+        """Run button: stop a running test or start a new one"""
+        if self.test is not None and self.test.running:
+            self.test.cancel()
+        else:
+            self.start_test(window)
+
+    def start_test(self, window):
+        """Start a test burst with the count from the window"""
+        settings = self.widget.settings
+        try:
+            count = min(max(int(window.count_var.get()), 1), 100)
+        except ValueError:
+            count = settings["test_count"]
+        window.count_var.set(str(count))
+        if count != settings["test_count"]:
+            settings["test_count"] = count
+            self.widget.save_settings()
+
+        if settings["probe_mode"] == "http":
+            target = settings["http_url"]
+        elif settings["probe_mode"] == "tcp":
+            target = f"{settings['ping_host']} (TCP {settings['tcp_port']})"
+        else:
+            target = settings["ping_host"]
+
+        self.test = ConnectionTest(settings, self.widget.resolver.resolve, count)
+        window.status_label.config(text=f"Testing {target}...", fg=window.status_color)
+        window.summary_label.config(text="")
+        window.result_text.config(state=tk.NORMAL)
+        window.result_text.delete("1.0", tk.END)
+        window.result_text.config(state=tk.DISABLED)
+        window.run_btn.config(text="Stop")
+        self.test.start()
+        self.root.after(TEST_POLL_INTERVAL, self.poll_test, window, self.test)
+
+    def poll_test(self, window, test):
+        """Show the results that arrived since the last poll"""
+        if test is not self.test:
+            return  # Replaced by a newer run
+        finished = False
+        lines = []
+        while True:
+            try:
+                kind, index, response_time = test.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "done":
+                finished = True
+            elif response_time is None:
+                lines.append(f"#{index + 1}: no reply\n")
+            else:
+                _, status = classify_response_time(response_time)
+                lines.append(f"#{index + 1}: {response_time:.0f}ms ({status})\n")
+
+        if lines:
+            window.result_text.config(state=tk.NORMAL)
+            window.result_text.insert(tk.END, "".join(lines))
+            window.result_text.see(tk.END)
+            window.result_text.config(state=tk.DISABLED)
+
+            summary = test.summary()
+            text = f"Sent {summary.sent}, received {summary.received}, loss {summary.loss:.0%}"
+            if summary.avg is not None:
+                text += (
+                    f"\nmin/avg/max {summary.min:.0f}/{summary.avg:.0f}/{summary.max:.0f}ms,"
+                    f" jitter {summary.jitter:.1f}ms"
+                )
+            window.summary_label.config(text=text)
+
+        if not finished:
+            self.root.after(TEST_POLL_INTERVAL, self.poll_test, window, test)
+            return
+
+        summary = test.summary()
+        if test.cancelled.is_set():
+            window.status_label.config(text="Test Stopped")
+        elif summary.received:
+            window.status_label.config(text="Test Complete!", fg="green")
+        else:
+            window.status_label.config(text="Test Failed: no replies", fg="red")
+        window.run_btn.config(text="Run")
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+DNS helpers for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+A minimal DNS client used to time the resolver on its own and to cache the
+addresses of probe targets for as long as their TTL allows, so resolver
+latency never leaks into RTT samples.
+"""
+
+import random
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+
+DNS_PORT = 53
+DNS_TYPE_A = 1
+DNS_CLASS_IN = 1
+
+DnsAnswer = namedtuple("DnsAnswer", "rtt rcode addresses")  # addresses: [(ip, ttl)]
+
+dns_header = struct.Struct("!HHHHHH")
+dns_record = struct.Struct("!HHIH")
+
+
+def build_dns_query(name, query_id, qtype=DNS_TYPE_A):
+    """Build a recursive query packet for one name"""
+    header = dns_header.pack(query_id, 0x0100, 1, 0, 0, 0)  # RD set, one question
+    labels = name.rstrip(".").encode("idna").split(b".")
+    qname = b"".join(bytes([len(label)]) + label for label in labels) + b"\x00"
+    return header + qname + struct.pack("!HH", qtype, DNS_CLASS_IN)
+
+
+def skip_dns_name(data, offset):
+    """Return the offset just past a (possibly compressed) name"""
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2  # Compression pointer ends the name
+        offset += length + 1
+
+
+def parse_dns_response(data, query_id):
+    """Return (rcode, [(address, ttl)]) for a response to query_id, or None"""
+    if len(data) < dns_header.size:
+        return None
+    response_id, flags, questions, answers, _, _ = dns_header.unpack_from(data)
+    if response_id != query_id or not flags & 0x8000:
+        return None
+
+    offset = dns_header.size
+    for _ in range(questions):
+        offset = skip_dns_name(data, offset) + 4
+
+    addresses = []
+    for _ in range(answers):
+        offset = skip_dns_name(data, offset)
+        rtype, rclass, ttl, length = dns_record.unpack_from(data, offset)
+        offset += dns_record.size
+        # CNAME records are skipped; the chain's A records follow in the answer
+        if rtype == DNS_TYPE_A and rclass == DNS_CLASS_IN and length == 4:
+            addresses.append((socket.inet_ntoa(data[offset : offset + 4]), ttl))
+        offset += length
+    return flags & 0x000F, addresses
+
+
+def is_ipv4_address(host):
+    """Whether host is already a dotted IPv4 address"""
+    try:
+        socket.inet_aton(host)
+    except OSError:
+        return False
+    return host.count(".") == 3
+
+
+def resolv_conf_dns_server():
+    """First IPv4 nameserver from /etc/resolv.conf, or None where there is none"""
+    try:
+        with open("/etc/resolv.conf", "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    if is_ipv4_address(fields[1]):
+                        return fields[1]
+    except OSError:
+        pass
+    return None
+
+
+def windows_dns_server():
+    """First IPv4 DNS server from GetNetworkParams, or None where there is none"""
+    import ctypes
+
+    class IpAddrString(ctypes.Structure):
+        pass
+
+    IpAddrString._fields_ = [
+        ("Next", ctypes.POINTER(IpAddrString)),
+        ("IpAddress", ctypes.c_char * 16),
+        ("IpMask", ctypes.c_char * 16),
+        ("Context", ctypes.c_ulong),
+    ]
+
+    class FixedInfo(ctypes.Structure):
+        _fields_ = [
+            ("HostName", ctypes.c_char * 132),
+            ("DomainName", ctypes.c_char * 132),
+            ("CurrentDnsServer", ctypes.POINTER(IpAddrString)),
+            ("DnsServerList", IpAddrString),
+            ("NodeType", ctypes.c_uint),
+            ("ScopeId", ctypes.c_char * 260),
+            ("EnableRouting", ctypes.c_uint),
+            ("EnableProxy", ctypes.c_uint),
+            ("EnableDns", ctypes.c_uint),
+        ]
+
+    ERROR_BUFFER_OVERFLOW = 111
+    get_network_params = ctypes.windll.iphlpapi.GetNetworkParams
+    size = ctypes.c_ulong(0)
+    if get_network_params(None, ctypes.byref(size)) != ERROR_BUFFER_OVERFLOW:
+        return None
+    buffer = ctypes.create_string_buffer(size.value)
+    if get_network_params(buffer, ctypes.byref(size)) != 0:
+        return None
+
+    entry = ctypes.cast(buffer, ctypes.POINTER(FixedInfo)).contents.DnsServerList
+    while True:
+        address = entry.IpAddress.decode("ascii", "replace")
+        if is_ipv4_address(address) and address != "0.0.0.0":
+            return address
+        if not entry.Next:
+            return None
+        entry = entry.Next.contents
+
+
+# Resolver lookup per platform; others read /etc/resolv.conf
+DNS_SERVER_SOURCES = {
+    "win32": windows_dns_server,
+}
+
+
+def system_dns_server():
+    """The operating system's first IPv4 resolver, or None where there is none"""
+    source = DNS_SERVER_SOURCES.get(sys.platform, resolv_conf_dns_server)
+    try:
+        return source()
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"Error reading the system resolver: {e}")
+        return None
+
+
+class DnsProber:
+    """Time raw UDP queries to a resolver over one long-lived socket"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.lock = threading.Lock()
+
+    def close(self):
+        """Close the query socket"""
+        self.sock.close()
+
+    def query(self, name, server, timeout, port=DNS_PORT):
+        """Send one A query and return a DnsAnswer, or None on timeout
+
+        Queries made while another one waits on the shared socket get a
+        socket of their own, so parallel lookups time out together rather
+        than one after another.
+        """
+        if self.lock.acquire(blocking=False):
+            try:
+                # Discard late answers to earlier queries that timed out
+                while select.select([self.sock], [], [], 0)[0]:
+                    try:
+                        self.sock.recvfrom(4096)
+                    except OSError:
+                        break
+                return self.exchange(self.sock, name, server, timeout, port)
+            finally:
+                self.lock.release()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        try:
+            return self.exchange(sock, name, server, timeout, port)
+        finally:
+            sock.close()
+
+    def exchange(self, sock, name, server, timeout, port):
+        """Send a query on sock and wait for its answer"""
+        query_id = random.getrandbits(16)
+        packet = build_dns_query(name, query_id)
+        start = time.perf_counter_ns()
+        deadline = start + int(timeout * 1_000_000_000)
+        sock.sendto(packet, (server, port))
+
+        while True:
+            remaining = (deadline - time.perf_counter_ns()) / 1_000_000_000
+            if remaining <= 0:
+                return None
+            if not select.select([sock], [], [], remaining)[0]:
+                return None
+            try:
+                data, source = sock.recvfrom(4096)
+            except (BlockingIOError, ConnectionResetError):
+                # Windows reports an ICMP port unreachable as a reset
+                continue
+            received = time.perf_counter_ns()
+            if source[0] != server:
+                continue
+            try:
+                parsed = parse_dns_response(data, query_id)
+            except (IndexError, struct.error):
+                continue  # Malformed packet
+            if parsed is None:
+                continue
+            rcode, addresses = parsed
+            return DnsAnswer((received - start) / 1_000_000, rcode, addresses)
+
+
+class ResolverCache:
+    """Resolve probe targets once and reuse the answer until its TTL expires"""
+
+    def __init__(
+        self,
+        server=None,
+        min_ttl=5,
+        max_ttl=3600,
+        fallback_ttl=60,
+        max_stale=86400,
+        port=DNS_PORT,
+    ):
+        self.prober = DnsProber()
+        self.server = server  # None uses the operating system resolver
+        self.port = port
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.fallback_ttl = fallback_ttl  # For answers that carry no TTL
+        self.max_stale = max_stale  # Seconds an answer may be served past its TTL
+        self.entries = {}  # host -> (address, expires, stale_until), monotonic times
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # Lookups that failed and were answered from the cache
+
+    def configure(self, server):
+        """Switch resolvers, dropping answers cached from the old one"""
+        with self.lock:
+            if server != self.server:
+                self.server = server
+                self.entries.clear()
+
+    def clear(self):
+        """Forget every cached answer, e.g. after moving to another network"""
+        with self.lock:
+            self.entries.clear()
+
+    def close(self):
+        """Release the query socket"""
+        self.prober.close()
+
+    def cached(self, host):
+        """Return a still-valid cached address for host, or None"""
+        if is_ipv4_address(host):
+            return host
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def resolve(self, host, timeout=2):
+        """Return an IPv4 address for host, querying only when the cache is stale
+
+        If the lookup fails, the last answer is served for up to `max_stale`
+        seconds past its TTL (RFC 8767), so a flaky resolver does not read as
+        a lost connection. It is asked again after `min_ttl` seconds.
+        """
+        address = self.cached(host)
+        if address is not None:
+            return address
+
+        try:
+            address, ttl = self.lookup(host, timeout)
+        except OSError:
+            now = time.monotonic()
+            with self.lock:
+                entry = self.entries.get(host)
+                if entry is None or now > entry[2]:
+                    raise
+                self.stale += 1
+                self.entries[host] = (entry[0], now + self.min_ttl, entry[2])
+            return entry[0]
+
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        now = time.monotonic()
+        with self.lock:
+            self.misses += 1
+            self.entries[host] = (address, now + ttl, now + ttl + self.max_stale)
+        return address
+
+    def lookup(self, host, timeout):
+        """Query for host and return (address, ttl)"""
+        if self.server:
+            answer = self.prober.query(host, self.server, timeout, self.port)
+            if answer is not None and answer.addresses:
+                return answer.addresses[0][0], min(ttl for _, ttl in answer.addresses)
+        # No resolver to ask directly, or it failed: defer to the system
+        return socket.gethostbyname(host), self.fallback_ttl
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Multi-target probe engine for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Probes many hosts concurrently on one asyncio event loop and reduces the
+per-target results to the (bars, status) pair shown in the tray.
+"""
+
+import asyncio
+import platform
+import socket
+import struct
+import time
+from collections import namedtuple
+
+from network_probes import (
+    CONNECT_ANSWERED,
+    classify_response_time,
+    hidden_window_options,
+    parse_ping_line,
+    ping_command,
+    split_endpoint,
+)
+
+
+WINDOWS = platform.system().lower() == "windows"
+
+AGGREGATE_MODES = ("worst", "best", "quorum")
+PROBE_MODES = ("icmp", "tcp")
+
+# Higher is better, used to order results that have the same number of bars
+STATUS_RANK = {"no_connection": 0, "unknown": 1, "slow": 2, "good": 3}
+
+ProbeResult = namedtuple("ProbeResult", "host bars status response_time checked_at")
+
+
+def result_rank(result):
+    """Sort key ordering results from worst to best"""
+    return result.bars, STATUS_RANK.get(result.status, 0)
+
+
+def aggregate_results(results, mode="worst", quorum=0):
+    """Reduce per-target results to the single result the tray should show
+
+    worst  - the weakest target decides
+    best   - the strongest target decides
+    quorum - the best level reached by at least `quorum` targets (0 = majority)
+    """
+    if not results:
+        return ProbeResult(None, 0, "unknown", 0, 0)
+    ranked = sorted(results, key=result_rank, reverse=True)
+    if mode == "best":
+        return ranked[0]
+    if mode == "quorum":
+        needed = quorum if quorum > 0 else len(ranked) // 2 + 1
+        return ranked[min(needed, len(ranked)) - 1]
+    return ranked[-1]
+
+
+class MultiTargetEngine:
+    """Probe N targets at once on a persistent event loop owned by the caller's thread"""
+
+    def __init__(self, prober, concurrency=256, resolver=None, quiet=False):
+        self.prober = prober  # Shared IcmpProber, or None to use the ping command
+        self.concurrency = concurrency
+        self.resolver = resolver  # ResolverCache, or None to resolve each host once
+        self.quiet = quiet  # Do not print failed probes
+        self.selector_loop = self.icmp_available
+        self.loop = self.new_loop()
+        self.addresses = {}
+        self.pending = {}
+        self.results = {}
+        self.reading = False
+
+    @property
+    def icmp_available(self):
+        return self.prober is not None and self.prober.available
+
+    def new_loop(self):
+        """Event loop able to read the ICMP socket, or to run ping without one
+
+        Windows' default proactor loop has no add_reader and its selector loop
+        cannot start subprocesses, so there the loop follows the socket.
+        """
+        if WINDOWS and self.selector_loop:
+            return asyncio.SelectorEventLoop()
+        return asyncio.new_event_loop()
+
+    def probe(self, targets, timeout, mode="icmp", port=443):
+        """Probe every target concurrently and return {host: ProbeResult}
+
+        In "tcp" mode targets may be "host:port"; `port` is used otherwise.
+        """
+        if WINDOWS and self.selector_loop != self.icmp_available:
+            # The ICMP socket was closed after a failure; ping needs a proactor
+            self.loop.close()
+            self.selector_loop = self.icmp_available
+            self.loop = self.new_loop()
+        results = self.loop.run_until_complete(
+            self.probe_targets(targets, timeout, mode, port)
+        )
+        self.results = {result.host: result for result in results}
+        return self.results
+
+    def close(self):
+        """Release the event loop"""
+        self.stop_reading()
+        if not self.loop.is_closed():
+            self.loop.close()
+
+    async def probe_targets(self, targets, timeout, mode, port):
+        """Run one probe per target and gather the results"""
+        if mode == "icmp" and not self.icmp_available:
+            mode = "command"
+        if mode == "icmp":
+            try:
+                self.start_reading()
+            except (NotImplementedError, OSError) as e:
+                print(f"Cannot read ICMP replies on this event loop, using ping: {e}")
+                mode = "command"
+        try:
+            limit = asyncio.Semaphore(self.concurrency)
+            return await asyncio.gather(
+                *(
+                    self.probe_target(host, timeout, mode, port, limit)
+                    for host in targets
+                )
+            )
+        finally:
+            if mode == "icmp":
+                self.stop_reading()
+
+    async def probe_target(self, host, timeout, mode, port, limit):
+        """Probe a single target, never raising"""
+        try:
+            if mode == "icmp":
+                response_time = await self.probe_icmp(host, timeout)
+            elif mode == "tcp":
+                async with limit:
+                    response_time = await self.probe_tcp(host, port, timeout)
+            else:
+                async with limit:
+                    response_time = await self.probe_command(host, timeout)
+        except Exception as e:
+            if not self.quiet:
+                print(f"Probe of {host} failed: {e}")
+            response_time = None
+
+        if response_time is None:
+            return ProbeResult(host, 0, "no_connection", 0, time.time())
+        bars, status = classify_response_time(response_time)
+        return ProbeResult(host, bars, status, response_time, time.time())
+
+    async def resolve(self, host):
+        """Resolve a host to an IPv4 address, remembering the answer"""
+        if self.resolver is not None:
+            address = self.resolver.cached(host)
+            if address is None:
+                # Cache misses query off the loop so other probes keep running
+                address = await self.loop.run_in_executor(
+                    None, self.resolver.resolve, host
+                )
+            return address
+        address = self.addresses.get(host)
+        if address is None:
+            infos = await self.loop.getaddrinfo(
+                host, None, family=socket.AF_INET, type=socket.SOCK_DGRAM
+            )
+            address = infos[0][4][0]
+            self.addresses[host] = address
+        return address
+
+    async def probe_icmp(self, host, timeout):
+        """Send one echo over the shared ICMP socket and await the matching reply"""
+        address = await self.resolve(host)
+        future = self.loop.create_future()
+        deadline = self.loop.time() + timeout
+        while True:
+            try:
+                sequence, sent = self.prober.send_echo(address)
+                break
+            except (BlockingIOError, InterruptedError):
+                # Socket buffer full with hundreds of echoes in flight
+                if self.loop.time() >= deadline:
+                    return None
+                await asyncio.sleep(0.001)
+
+        key = (address, sequence)
+        self.pending[key] = (future, sent)
+        try:
+            return await asyncio.wait_for(future, max(deadline - self.loop.time(), 0))
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.pending.pop(key, None)
+
+    def start_reading(self):
+        """Dispatch replies from the ICMP socket to waiting probes"""
+        if not self.reading:
+            try:
+                # Room for a reply from every target arriving at once
+                self.prober.sock.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_RCVBUF, self.concurrency * 8192
+                )
+            except OSError:
+                pass
+            self.loop.add_reader(self.prober.sock.fileno(), self.on_readable)
+            self.reading = True
+
+    def stop_reading(self):
+        """Stop watching the ICMP socket"""
+        if self.reading:
+            if self.prober.sock is not None:
+                self.loop.remove_reader(self.prober.sock.fileno())
+            self.reading = False
+
+    def on_readable(self):
+        """Resolve the future waiting on each reply that arrived"""
+        for source, sequence, received in self.prober.read_replies():
+            waiter = self.pending.pop((source, sequence), None)
+            if waiter is None:
+                continue  # Late reply from a probe that already timed out
+            future, sent = waiter
+            if not future.done():
+                future.set_result((received - sent) / 1_000_000)
+
+    async def probe_tcp(self, target, port, timeout):
+        """Time a TCP handshake to the target without blocking the loop"""
+        host, port = split_endpoint(target, port)
+        address = await self.resolve(host)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        try:
+            start = time.perf_counter_ns()
+            try:
+                await asyncio.wait_for(
+                    self.loop.sock_connect(sock, (address, port)), timeout
+                )
+            except ConnectionRefusedError:
+                pass  # The host answered with a reset, which still times the path
+            except OSError as e:
+                if e.errno not in CONNECT_ANSWERED:
+                    return None
+            except asyncio.TimeoutError:
+                return None
+            return (time.perf_counter_ns() - start) / 1_000_000
+        finally:
+            sock.close()
+
+    async def probe_command(self, host, timeout):
+        """Fallback one-shot ping command when no ICMP socket is available"""
+        cmd = ping_command(host, timeout)
+        startupinfo, creation_flags = hidden_window_options()
+        options = {"creationflags": creation_flags}
+        if startupinfo is not None:
+            options["startupinfo"] = startupinfo
+
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            stdin=asyncio.subprocess.DEVNULL,
+            **options,
+        )
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), timeout + 1)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return None
+
+        for line in output.decode(errors="replace").splitlines():
+            parsed = parse_ping_line(line)
+            if parsed is not None:
+                return parsed[1]
+        return None
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Network change notifications for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Watches the operating system for interface, address and route changes (a
+Wi-Fi handoff, a VPN coming up) so the monitor can re-probe at once instead
+of waiting out its interval.
+"""
+
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+
+
+# rtnetlink multicast groups
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+
+# rtnetlink message types that mean the path may have changed
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+CHANGE_MESSAGES = {
+    RTM_NEWLINK,
+    RTM_DELLINK,
+    RTM_NEWADDR,
+    RTM_DELADDR,
+    RTM_NEWROUTE,
+    RTM_DELROUTE,
+}
+
+# length, type, flags, sequence, port id
+netlink_header = struct.Struct("=IHHII")
+
+
+def netlink_message_types(data):
+    """Yield the type of each message in a netlink datagram"""
+    offset = 0
+    while offset + netlink_header.size <= len(data):
+        length, message_type, _, _, _ = netlink_header.unpack_from(data, offset)
+        if length < netlink_header.size:
+            return  # Malformed; nothing after it can be trusted
+        yield message_type
+        offset += (length + 3) & ~3  # Messages are 4-byte aligned
+
+
+class ChangeWatcher:
+    """Base for the platform backends: call `on_change` once per burst of changes
+
+    A handoff produces a flurry of link, address and route messages; they are
+    coalesced until `settle` seconds pass without another, then reported once.
+    """
+
+    def __init__(self, on_change, settle=0.5):
+        self.on_change = on_change
+        self.settle = settle
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        """Watch on a background thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop watching"""
+        self.stopped.set()
+
+    def run(self):
+        raise NotImplementedError
+
+
+class NetlinkWatcher(ChangeWatcher):
+    """Linux backend subscribed to rtnetlink link, address and route groups"""
+
+    def __init__(self, on_change, settle=0.5):
+        super().__init__(on_change, settle)
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+        self.sock.setblocking(False)
+        self.wakeup_read, self.wakeup_write = socket.socketpair()
+
+    def stop(self):
+        super().stop()
+        try:
+            self.wakeup_write.send(b"\0")
+        except OSError:
+            pass
+
+    def changed(self):
+        """Drain pending messages; return whether any of them was a change"""
+        changed = False
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return changed
+            except OSError:
+                return True  # ENOBUFS: messages were dropped, assume a change
+            if any(kind in CHANGE_MESSAGES for kind in netlink_message_types(data)):
+                changed = True
+
+    def run(self):
+        pending = None  # When the current burst of changes started settling
+        try:
+            while not self.stopped.is_set():
+                timeout = None
+                if pending is not None:
+                    timeout = max(pending + self.settle - time.monotonic(), 0)
+                readable, _, _ = select.select(
+                    [self.sock, self.wakeup_read], [], [], timeout
+                )
+                if self.sock in readable and self.changed():
+                    pending = time.monotonic()
+                elif not readable and pending is not None:
+                    pending = None
+                    self.on_change()
+        finally:
+            self.sock.close()
+            self.wakeup_read.close()
+            self.wakeup_write.close()
+
+
+class WindowsRouteWatcher(ChangeWatcher):
+    """Windows backend blocking in NotifyAddrChange/NotifyRouteChange
+
+    Those calls cannot be interrupted, so after stop() the daemon threads
+    simply end at the next change or with the process.
+    """
+
+    def __init__(self, on_change, settle=0.5):
+        super().__init__(on_change, settle)
+        import ctypes
+
+        self.iphlpapi = ctypes.windll.iphlpapi
+        self.condition = threading.Condition()
+        self.last_change = None
+
+    def stop(self):
+        super().stop()
+        with self.condition:
+            self.condition.notify_all()
+
+    def notify_loop(self, notify):
+        while not self.stopped.is_set():
+            if notify(None, None) != 0:  # Blocks until the next change
+                return
+            with self.condition:
+                self.last_change = time.monotonic()
+                self.condition.notify_all()
+
+    def run(self):
+        for notify in (self.iphlpapi.NotifyAddrChange, self.iphlpapi.NotifyRouteChange):
+            threading.Thread(target=self.notify_loop, args=(notify,), daemon=True).start()
+        with self.condition:
+            while not self.stopped.is_set():
+                if self.last_change is None:
+                    self.condition.wait()
+                    continue
+                remaining = self.last_change + self.settle - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                self.last_change = None
+                self.condition.release()
+                try:
+                    self.on_change()
+                finally:
+                    self.condition.acquire()
+
+
+# Change notification backend per platform; others can be registered here
+WATCHERS = {
+    "linux": NetlinkWatcher,
+    "win32": WindowsRouteWatcher,
+}
+
+
+def create_watcher(on_change, settle=0.5):
+    """Return a started-able watcher for this platform, or None if there is none"""
+    watcher_class = WATCHERS.get(sys.platform)
+    if watcher_class is None:
+        return None
+    try:
+        return watcher_class(on_change, settle)
+    except (OSError, AttributeError) as e:
+        print(f"Network change notifications unavailable: {e}")
+        return None
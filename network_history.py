@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Sample history for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Append-only store of fixed-width binary records in memory-mapped segment
+files. Appending is a struct.pack_into on the map; queries binary-search the
+segments and decode them a chunk at a time, so memory stays constant.
+"""
+
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from network_settings import atomic_write_json
+
+
+STATUS_CODES = {"unknown": 0, "good": 1, "slow": 2, "no_connection": 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+SEGMENT_MAGIC = b"NSWH"
+SEGMENT_VERSION = 1
+
+# magic, version, record size, record count
+segment_header = struct.Struct("<4sHHQ")
+# timestamp, RTT in ms (NaN = lost), target id, status code, padding
+history_record = struct.Struct("<dfHBx")
+
+HistoryRecord = namedtuple("HistoryRecord", "timestamp target rtt status")
+
+
+def default_data_dir():
+    """Per-user directory for the widget's data files"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "NetworkStatusWidget")
+    base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, "network-status-widget")
+
+
+class HistorySegment:
+    """One preallocated, memory-mapped segment file"""
+
+    def __init__(self, path, capacity=None):
+        self.path = path
+        created = not os.path.exists(path)
+        if created:
+            size = segment_header.size + capacity * history_record.size
+            with open(path, "wb") as f:
+                f.truncate(size)
+        self.file = open(path, "r+b")
+        self.map = None
+        try:
+            if os.fstat(self.file.fileno()).st_size < segment_header.size:
+                raise ValueError(f"Truncated history segment: {path}")
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        except (OSError, ValueError):
+            self.file.close()
+            raise
+        self.capacity = (len(self.map) - segment_header.size) // history_record.size
+        if created:
+            segment_header.pack_into(
+                self.map, 0, SEGMENT_MAGIC, SEGMENT_VERSION, history_record.size, 0
+            )
+        magic, version, record_size, count = segment_header.unpack_from(self.map)
+        if magic != SEGMENT_MAGIC or record_size != history_record.size:
+            self.close()
+            raise ValueError(f"Not a history segment: {path}")
+        # A corrupt count must not send reads past the end of the map
+        self.count = min(count, self.capacity)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def close(self):
+        """Write back and unmap the segment"""
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.map = None
+            self.file.close()
+
+    def append(self, timestamp, target, rtt, status):
+        """Write one record; the header count is bumped last so readers never see half"""
+        offset = segment_header.size + self.count * history_record.size
+        history_record.pack_into(self.map, offset, timestamp, rtt, target, status)
+        self.count += 1
+        struct.pack_into("<Q", self.map, 8, self.count)
+
+    def timestamp_at(self, index):
+        offset = segment_header.size + index * history_record.size
+        return struct.unpack_from("<d", self.map, offset)[0]
+
+    def first_at_or_after(self, timestamp, count):
+        """Binary search for the first record not older than timestamp"""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp_at(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class HistoryStore:
+    """Rotating set of segments holding (timestamp, target, RTT, status) records"""
+
+    def __init__(self, directory, segment_records=262144, max_segments=8):
+        self.directory = directory
+        self.segment_records = segment_records  # 4 MiB, about three days at 1 Hz
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.targets_file = os.path.join(directory, "targets.json")
+        self.targets = self.load_targets()
+        self.segments = sorted(glob.glob(os.path.join(directory, "history-*.seg")))
+        self.active = None
+        if self.segments:
+            try:
+                self.active = HistorySegment(self.segments[-1])
+            except (OSError, ValueError) as e:
+                # Left for rotation to delete; a fresh segment takes over
+                print(f"Error opening history: {e}")
+        if self.active is None or self.active.full:
+            self.rotate()
+
+    def load_targets(self):
+        """Load the target name to id table"""
+        try:
+            with open(self.targets_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def target_id(self, name):
+        """Return the numeric id of a target, assigning one the first time"""
+        target = self.targets.get(name)
+        if target is None:
+            target = len(self.targets)
+            self.targets[name] = target
+            atomic_write_json(self.targets_file, self.targets)
+        return target
+
+    def rotate(self):
+        """Start a new segment and drop the oldest beyond max_segments"""
+        if self.active is not None:
+            self.active.close()
+        number = 1
+        if self.segments:
+            number = int(os.path.basename(self.segments[-1])[8:-4]) + 1
+        path = os.path.join(self.directory, f"history-{number:08d}.seg")
+        self.active = HistorySegment(path, self.segment_records)
+        self.segments.append(path)
+        while len(self.segments) > self.max_segments:
+            try:
+                os.remove(self.segments.pop(0))
+            except OSError as e:
+                print(f"Error removing old history: {e}")
+
+    def append(self, target, rtt, status, timestamp=None):
+        """Record one sample; rtt None marks a lost probe"""
+        with self.lock:
+            if self.active.full:
+                self.rotate()
+            self.active.append(
+                time.time() if timestamp is None else timestamp,
+                target,
+                math.nan if rtt is None else rtt,
+                STATUS_CODES.get(status, 0),
+            )
+
+    def close(self):
+        """Flush and close the active segment"""
+        with self.lock:
+            if self.active is not None:
+                self.active.close()
+                self.active = None
+
+    def query(self, start, end=None, target=None):
+        """Yield HistoryRecords with start <= timestamp <= end, oldest first"""
+        end = time.time() if end is None else end
+        with self.lock:
+            paths = list(self.segments)
+
+        for path in paths:
+            # Readers map segments on their own so rotation never waits on them
+            try:
+                segment = HistorySegment(path)
+            except (OSError, ValueError):
+                continue  # Rotated away while we were reading
+            count = segment.count
+            records = None
+            try:
+                if count == 0 or segment.timestamp_at(count - 1) < start:
+                    continue
+                if segment.timestamp_at(0) > end:
+                    break
+                first = segment.first_at_or_after(start, count)
+                records = self.scan(segment, first, count, end, target)
+                yield from records
+            finally:
+                if records is not None:
+                    records.close()  # Releases its view of the map first
+                segment.close()
+
+    def scan(self, segment, first, count, end, target, chunk=4096):
+        """Decode records chunk by chunk straight from the map, without copying it"""
+        view = memoryview(segment.map)
+        try:
+            for chunk_start in range(first, count, chunk):
+                chunk_end = min(chunk_start + chunk, count)
+                offset = segment_header.size + chunk_start * history_record.size
+                length = (chunk_end - chunk_start) * history_record.size
+                records = history_record.iter_unpack(view[offset : offset + length])
+                for timestamp, rtt, record_target, status in records:
+                    if timestamp > end:
+                        return
+                    if target is not None and record_target != target:
+                        continue
+                    yield HistoryRecord(
+                        timestamp,
+                        record_target,
+                        None if rtt != rtt else rtt,  # NaN marks a lost probe
+                        STATUS_NAMES.get(status, "unknown"),
+                    )
+        finally:
+            view.release()
+
+    def recent(self, minutes, target=None):
+        """Yield the records of the last N minutes"""
+        return self.query(time.time() - minutes * 60, target=target)
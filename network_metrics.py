@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Metrics endpoint for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Serves the monitor's state in the Prometheus text and OpenMetrics formats.
+Each check only bumps counters and gauges; a scrape renders from those, and
+the rendered page is reused until the next check changes something.
+"""
+
+import math
+import socketserver
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+from network_stats import ROLLUP_STATUSES
+
+
+# Upper bounds of the RTT histogram buckets, in seconds
+RTT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def format_value(value):
+    """Sample value in exposition syntax"""
+    if value is None or math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    """{name="value",...} for a tuple of (name, value) pairs, or an empty string"""
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class ProbeCounters:
+    """Probe and loss counters with an RTT histogram, for one target"""
+
+    __slots__ = ("probes", "lost", "buckets", "rtt_sum", "last_rtt")
+
+    def __init__(self):
+        self.probes = 0
+        self.lost = 0
+        self.buckets = [0] * (len(RTT_BUCKETS) + 1)  # Per bucket, last is +Inf
+        self.rtt_sum = 0.0
+        self.last_rtt = None
+
+    def add(self, response_time):
+        """Count one probe: an RTT in ms, or None when it was lost"""
+        self.probes += 1
+        if response_time is None:
+            self.lost += 1
+            return
+        seconds = response_time / 1000
+        self.buckets[bisect_left(RTT_BUCKETS, seconds)] += 1
+        self.rtt_sum += seconds
+        self.last_rtt = seconds
+
+
+class MonitorMetrics:
+    """Counters and gauges fed by the monitor, rendered on demand"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # host -> ProbeCounters
+        self.gauges = {}
+        self.pages = {}  # openmetrics flag -> rendered bytes, cleared on change
+
+    def observe(self, monitor, sample):
+        """Monitor listener: fold one check into the metrics"""
+        stats = monitor.signal_smoother.stats
+        with self.lock:
+            if monitor.settings["targets"]:
+                for host, result in monitor.target_results.items():
+                    self.target(host).add(result.response_time if result.bars else None)
+            else:
+                counters = self.target(monitor.history_target())
+                if monitor.last_burst is not None:
+                    for burst_sample in monitor.last_burst.samples:
+                        counters.add(burst_sample)
+                else:
+                    counters.add(sample)
+            self.gauges = {
+                "status": monitor.current_status,
+                "bars": monitor.current_signal_strength,
+                "ewma": None if stats.ewma is None else stats.ewma / 1000,
+                "jitter": stats.jitter / 1000,
+                "loss": stats.loss_rate,
+                # A failed lookup leaves last_dns_time at 0, not a latency
+                "dns": (
+                    monitor.last_dns_time / 1000
+                    if monitor.dns_status in ("good", "slow")
+                    else None
+                ),
+            }
+            self.pages.clear()
+
+    def target(self, host):
+        counters = self.counters.get(host)
+        if counters is None:
+            counters = self.counters[host] = ProbeCounters()
+        return counters
+
+    def render(self, openmetrics=False):
+        """Exposition page as bytes, rendered at most once per check"""
+        with self.lock:
+            page = self.pages.get(openmetrics)
+            if page is None:
+                page = "".join(self.lines(openmetrics)).encode()
+                self.pages[openmetrics] = page
+            return page
+
+    def lines(self, openmetrics):
+        """Yield the exposition lines; call with the lock held"""
+
+        def family(name, kind, help_text):
+            # Prometheus text names the counter family with its _total suffix
+            if kind == "counter" and not openmetrics:
+                name += "_total"
+            if kind == "stateset" and not openmetrics:
+                kind = "gauge"
+            yield f"# HELP {name} {help_text}\n"
+            yield f"# TYPE {name} {kind}\n"
+
+        def sample(name, value, labels=()):
+            yield f"{name}{format_labels(labels)} {format_value(value)}\n"
+
+        gauges = self.gauges
+        if gauges:
+            yield from family(
+                "network_status", "stateset", "Current connection status"
+            )
+            for state in ROLLUP_STATUSES:
+                yield from sample(
+                    "network_status",
+                    int(gauges["status"] == state),
+                    (("network_status", state),),
+                )
+            yield from family("network_signal_bars", "gauge", "Signal bars shown")
+            yield from sample("network_signal_bars", gauges["bars"])
+            yield from family(
+                "network_rtt_ewma_seconds", "gauge", "Smoothed round-trip time"
+            )
+            yield from sample("network_rtt_ewma_seconds", gauges["ewma"])
+            yield from family(
+                "network_jitter_seconds", "gauge", "RFC 3550 interarrival jitter"
+            )
+            yield from sample("network_jitter_seconds", gauges["jitter"])
+            yield from family(
+                "network_loss_ratio", "gauge", "Lost probes in the rolling window"
+            )
+            yield from sample("network_loss_ratio", gauges["loss"])
+            if gauges["dns"] is not None:
+                yield from family(
+                    "network_dns_rtt_seconds", "gauge", "Last resolver response time"
+                )
+                yield from sample("network_dns_rtt_seconds", gauges["dns"])
+
+        counters = self.counters
+        if counters:
+            yield from family("network_probes", "counter", "Probes sent")
+            for host, target in counters.items():
+                yield from sample(
+                    "network_probes_total", target.probes, (("target", host),)
+                )
+            yield from family("network_probes_lost", "counter", "Probes without a reply")
+            for host, target in counters.items():
+                yield from sample(
+                    "network_probes_lost_total", target.lost, (("target", host),)
+                )
+            yield from family(
+                "network_rtt_last_seconds", "gauge", "Round-trip time of the last reply"
+            )
+            for host, target in counters.items():
+                yield from sample(
+                    "network_rtt_last_seconds", target.last_rtt, (("target", host),)
+                )
+            yield from family(
+                "network_rtt_seconds", "histogram", "Round-trip time of answered probes"
+            )
+            for host, target in counters.items():
+                cumulative = 0
+                for bound, count in zip(RTT_BUCKETS + (math.inf,), target.buckets):
+                    cumulative += count
+                    yield from sample(
+                        "network_rtt_seconds_bucket",
+                        cumulative,
+                        (("target", host), ("le", format_value(float(bound)))),
+                    )
+                yield from sample(
+                    "network_rtt_seconds_count", cumulative, (("target", host),)
+                )
+                yield from sample(
+                    "network_rtt_seconds_sum", target.rtt_sum, (("target", host),)
+                )
+
+        if openmetrics:
+            yield "# EOF\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Answer GET /metrics from the server's MonitorMetrics"""
+
+    timeout = 10  # A stalled client cannot hold a worker for long
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = self.server.metrics.render(openmetrics)
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console
+
+
+class MetricsServer(socketserver.TCPServer):
+    """HTTP server handing each connection to a small fixed thread pool"""
+
+    allow_reuse_address = True
+
+    def __init__(self, metrics, address="127.0.0.1", port=9464, workers=4):
+        self.metrics = metrics
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="metrics")
+        self.thread = None
+        super().__init__((address, port), MetricsHandler)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def start(self):
+        """Serve on a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Stop serving and release the port"""
+        if self.thread is not None:
+            self.shutdown()
+        self.server_close()
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Path diagnosis for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Finds the default gateway and works out which layer of the path is failing
+(the local link, the router, DNS or the upstream network) from probes of the
+gateway, the resolver and the internet target made in the same cycle.
+"""
+
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from network_dns import is_ipv4_address
+from network_probes import hidden_window_options
+
+
+RTF_UP = 0x0001
+RTF_GATEWAY = 0x0002
+
+# Failure layers, from nearest to farthest
+PATH_LAYERS = ("link", "gateway", "dns", "upstream")
+
+LAYER_TEXT = {
+    "link": "No network link (no default route)",
+    "gateway": "Router not responding",
+    "dns": "DNS resolver failing",
+    "upstream": "Internet unreachable beyond the router",
+}
+
+
+def linux_default_gateway():
+    """Return (interface, gateway address) of the best default route, or None"""
+    best = None
+    try:
+        with open("/proc/net/route", "r") as f:
+            next(f)  # Column header
+            for line in f:
+                fields = line.split()
+                if len(fields) < 8 or fields[1] != "00000000":
+                    continue
+                flags = int(fields[3], 16)
+                if flags & (RTF_UP | RTF_GATEWAY) != RTF_UP | RTF_GATEWAY:
+                    continue
+                metric = int(fields[6])
+                if best is None or metric < best[0]:
+                    # The kernel prints addresses as host-order hex
+                    gateway = socket.inet_ntoa(struct.pack("<I", int(fields[2], 16)))
+                    best = (metric, fields[0], gateway)
+    except (OSError, StopIteration, ValueError):
+        return None
+    return None if best is None else best[1:]
+
+
+def windows_default_gateway():
+    """Return (interface address, gateway address) from `route print`, or None"""
+    startupinfo, creation_flags = hidden_window_options()
+    options = {"creationflags": creation_flags}
+    if startupinfo is not None:
+        options["startupinfo"] = startupinfo
+    try:
+        output = subprocess.run(
+            ["route", "print", "-4", "0.0.0.0"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            **options,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    best = None
+    for line in output.splitlines():
+        # Network Destination, Netmask, Gateway, Interface, Metric
+        fields = line.split()
+        if len(fields) != 5 or fields[:2] != ["0.0.0.0", "0.0.0.0"]:
+            continue
+        if not is_ipv4_address(fields[2]) or not fields[4].isdigit():
+            continue  # "On-link" routes have no gateway to probe
+        metric = int(fields[4])
+        if best is None or metric < best[0]:
+            best = (metric, fields[3], fields[2])
+    return None if best is None else best[1:]
+
+
+# Default gateway lookup per platform; other platforms can be registered here
+GATEWAY_SOURCES = {
+    "linux": linux_default_gateway,
+    "win32": windows_default_gateway,
+}
+
+
+class GatewayDiscovery:
+    """Remember the default gateway for a while, since looking it up can be slow"""
+
+    def __init__(self, source=None, ttl=60):
+        self.source = source or GATEWAY_SOURCES.get(sys.platform)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.route = None  # (interface, gateway) or None
+        self.expires = 0.0
+
+    @property
+    def supported(self):
+        return self.source is not None
+
+    def invalidate(self):
+        """Look the gateway up again on the next call, e.g. after a route change"""
+        with self.lock:
+            self.expires = 0.0
+
+    def gateway(self):
+        """Return (interface, gateway address), or None when there is no default route"""
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.expires:
+                self.route = self.source() if self.source is not None else None
+                self.expires = now + self.ttl
+            return self.route
+
+
+def classify_path(has_route, gateway_ok, dns_ok, internet_ok, resolved=True):
+    """Name the failing layer, or None when the path is healthy
+
+    gateway_ok and dns_ok may be None when that layer was not probed, and
+    resolved is False when the internet target's name could not be looked up,
+    so it was never probed. A router that drops pings is not blamed while the
+    internet target still answers.
+    """
+    if internet_ok:
+        return "dns" if dns_ok is False else None
+    if not has_route:
+        return "link"
+    if gateway_ok is False:
+        return "gateway"
+    if not resolved or (dns_ok is False and gateway_ok):
+        # The router answers but names do not resolve
+        return "dns"
+    # The router answers (or was not probed) but nothing past it does
+    return "upstream"
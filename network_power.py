@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Power policy for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Reads whether the machine runs on battery and whether the user's session is
+locked or idle, so the monitor can probe less often on battery and not at all
+while nobody is looking, and counts the wakeups that saves.
+"""
+
+import glob
+import os
+import subprocess
+import sys
+import time
+
+
+def linux_on_battery(root="/sys/class/power_supply"):
+    """True on battery, False on mains power, None without a battery
+
+    An online Mains or USB supply means mains power. An offline USB supply
+    says nothing, since idle USB-C ports report offline too.
+    """
+    has_battery = False
+    discharging = False
+    mains_online = None
+    for supply in glob.glob(os.path.join(root, "*")):
+        try:
+            with open(os.path.join(supply, "type"), "r") as f:
+                kind = f.read().strip()
+            if kind == "Battery":
+                has_battery = True
+                with open(os.path.join(supply, "status"), "r") as f:
+                    discharging = discharging or f.read().strip() == "Discharging"
+            elif kind in ("Mains", "USB"):
+                with open(os.path.join(supply, "online"), "r") as f:
+                    online = f.read().strip() == "1"
+                if online:
+                    mains_online = True  # Any supply feeding the machine
+                elif kind == "Mains" and mains_online is None:
+                    mains_online = False
+        except OSError:
+            continue
+    if not has_battery:
+        return None
+    if mains_online is not None:
+        return not mains_online
+    return discharging
+
+
+def windows_on_battery():
+    """True on battery, False on AC, None when Windows does not know"""
+    import ctypes
+
+    class SystemPowerStatus(ctypes.Structure):
+        _fields_ = [
+            ("ACLineStatus", ctypes.c_ubyte),
+            ("BatteryFlag", ctypes.c_ubyte),
+            ("BatteryLifePercent", ctypes.c_ubyte),
+            ("SystemStatusFlag", ctypes.c_ubyte),
+            ("BatteryLifeTime", ctypes.c_ulong),
+            ("BatteryFullLifeTime", ctypes.c_ulong),
+        ]
+
+    status = SystemPowerStatus()
+    if not ctypes.windll.kernel32.GetSystemPowerStatus(ctypes.byref(status)):
+        return None
+    if status.ACLineStatus == 255 or status.BatteryFlag == 128:  # Unknown, no battery
+        return None
+    return status.ACLineStatus == 0
+
+
+def linux_session_state():
+    """(locked, idle seconds) of this login session from systemd-logind
+
+    Raises FileNotFoundError where loginctl is not installed, and returns
+    (None, None) when logind did not answer or knows no such session.
+    """
+    session = os.environ.get("XDG_SESSION_ID", "auto")
+    try:
+        output = subprocess.run(
+            [
+                "loginctl",
+                "show-session",
+                session,
+                "-p",
+                "LockedHint",
+                "-p",
+                "IdleHint",
+                "-p",
+                "IdleSinceHintMonotonic",
+            ],
+            capture_output=True,
+            text=True,
+            timeout=2,
+        ).stdout
+    except subprocess.SubprocessError:
+        return None, None
+    values = dict(line.partition("=")[::2] for line in output.splitlines())
+    if "LockedHint" not in values:
+        return None, None  # No session (a service, a container), or logind is busy
+    locked = values["LockedHint"] == "yes"
+    idle = None
+    if values.get("IdleHint") == "yes":
+        since = int(values.get("IdleSinceHintMonotonic") or 0) / 1_000_000
+        # logind uses CLOCK_MONOTONIC, which is what time.monotonic reads here
+        idle = max(time.monotonic() - since, 0.0) if since else 0.0
+    return locked, idle
+
+
+def windows_session_state():
+    """(locked, idle seconds) from the input desktop and the last input time"""
+    import ctypes
+    from ctypes import wintypes
+
+    class LastInputInfo(ctypes.Structure):
+        _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+
+    user32 = ctypes.windll.user32
+    DESKTOP_SWITCHDESKTOP = 0x0100
+    desktop = user32.OpenInputDesktop(0, False, DESKTOP_SWITCHDESKTOP)
+    if not desktop:
+        locked = True  # The secure desktop (lock screen) has the input
+    else:
+        locked = not user32.SwitchDesktop(desktop)
+        user32.CloseDesktop(desktop)
+
+    info = LastInputInfo()
+    info.cbSize = ctypes.sizeof(info)
+    idle = None
+    if user32.GetLastInputInfo(ctypes.byref(info)):
+        # Both tick counts wrap together every 49.7 days
+        ticks = ctypes.windll.kernel32.GetTickCount() & 0xFFFFFFFF
+        idle = ((ticks - info.dwTime) & 0xFFFFFFFF) / 1000
+    return locked, idle
+
+
+# Power and session readers per platform; others can be registered here
+POWER_SOURCES = {
+    "linux": linux_on_battery,
+    "win32": windows_on_battery,
+}
+
+SESSION_SOURCES = {
+    "linux": linux_session_state,
+    "win32": windows_session_state,
+}
+
+# Seconds between session reads while probing, where a read is expensive;
+# loginctl is a process spawn, so Linux notices a lock up to a minute late
+SESSION_INTERVALS = {
+    "linux": 60,
+}
+
+# Consecutive empty session reads before the session is taken to be absent
+SESSION_FAILURE_LIMIT = 3
+
+
+class PowerPolicy:
+    """Decide how hard the monitor may probe from the power and session state
+
+    The power state is read at most every `check_interval` seconds. The
+    session is read every `session_interval` seconds while probing, and every
+    `check_interval` seconds while paused so probing resumes promptly.
+    """
+
+    def __init__(
+        self,
+        battery_factor=3,
+        idle_after=600,
+        pause_when_locked=True,
+        check_interval=10,
+        power_source=None,
+        session_source=None,
+        session_interval=None,
+    ):
+        self.battery_factor = battery_factor  # Interval multiplier on battery
+        self.idle_after = idle_after  # Seconds without input before pausing, 0 = never
+        self.pause_when_locked = pause_when_locked
+        self.check_interval = check_interval
+        self.power_source = power_source or POWER_SOURCES.get(sys.platform)
+        self.session_source = session_source or SESSION_SOURCES.get(sys.platform)
+        if session_interval is None:
+            session_interval = SESSION_INTERVALS.get(sys.platform, check_interval)
+        self.session_interval = session_interval
+        self.session_failures = 0  # Consecutive reads that found no session
+        self.on_battery = None
+        self.locked = None
+        self.idle = None
+        self.checked = None  # Monotonic time of the last read
+        self.session_checked = None  # Monotonic time of the last session read
+        self.started = time.monotonic()
+        self.last_wakeup = self.started
+        self.expected = 0.0  # Wakeups the unthrottled cadence would have made
+        self.wakeups = 0
+
+    def configure(self, battery_factor, idle_after, pause_when_locked):
+        self.battery_factor = battery_factor
+        self.idle_after = idle_after
+        self.pause_when_locked = pause_when_locked
+
+    def refresh(self, force=False):
+        """Re-read the power and session state if the last read is stale"""
+        now = time.monotonic()
+        fresh = self.checked is not None and now - self.checked < self.check_interval
+        if fresh and not force:
+            return
+        self.checked = now
+        try:
+            self.on_battery = self.power_source() if self.power_source else None
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Error reading power state: {e}")
+            self.on_battery = None
+        if not self.pause_when_locked and not self.idle_after:
+            self.locked = self.idle = None  # Nothing to pause for; skip the lookup
+            return
+        if self.session_source is None:
+            return
+        stale = (
+            self.session_checked is None
+            or now - self.session_checked >= self.session_interval
+        )
+        if not (stale or force or self.pause_reason):
+            return
+        self.session_checked = now
+        try:
+            locked, idle = self.session_source()
+        except FileNotFoundError:
+            locked = idle = None
+            self.session_failures = SESSION_FAILURE_LIMIT  # No loginctl to ask
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Error reading session state: {e}")
+            locked = idle = None
+        self.locked, self.idle = locked, idle
+        if locked is not None or idle is not None:
+            self.session_failures = 0
+            return
+        self.session_failures += 1
+        if self.session_failures >= SESSION_FAILURE_LIMIT:
+            print("No desktop session found; not pausing when locked or idle")
+            self.session_source = None  # Stop asking
+
+    @property
+    def pause_reason(self):
+        """Why probing is suspended ("locked" or "idle"), or None"""
+        if self.pause_when_locked and self.locked:
+            return "locked"
+        if self.idle_after and self.idle is not None and self.idle >= self.idle_after:
+            return "idle"
+        return None
+
+    def interval(self, interval):
+        """Stretch a probe interval when running on battery"""
+        if self.on_battery:
+            return interval * self.battery_factor
+        return interval
+
+    def record_wakeup(self, interval):
+        """Count one wakeup of the loop, and the ones `interval` would have made"""
+        now = time.monotonic()
+        self.expected += (now - self.last_wakeup) / interval
+        self.last_wakeup = now
+        self.wakeups += 1
+
+    @property
+    def wakeups_avoided_per_hour(self):
+        hours = (time.monotonic() - self.started) / 3600
+        if hours <= 0:
+            return 0.0
+        return max(self.expected - self.wakeups, 0.0) / hours
+
+    def state_text(self):
+        """One line for the status dialog"""
+        reason = self.pause_reason
+        if reason == "locked":
+            state = "paused while the session is locked"
+        elif reason == "idle":
+            state = "paused while the session is idle"
+        elif self.on_battery:
+            state = f"on battery, probing {self.battery_factor:g}x less often"
+        elif self.on_battery is None:
+            state = "no battery"
+        else:
+            state = "on AC power"
+        return f"Power: {state} ({self.wakeups_avoided_per_hour:.0f} wakeups avoided per hour)"
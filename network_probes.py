@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+"""
+Network probes used by the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Probe backends that measure round-trip time without spawning a process per check.
+"""
+
+import errno
+import http.client
+import os
+import platform
+import re
+import select
+import selectors
+import socket
+import ssl
+import struct
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# connect_ex results meaning the handshake is still in flight (10035 = WSAEWOULDBLOCK)
+CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035}
+# A refused connection still proves the host answered, so it carries a valid RTT
+CONNECT_ANSWERED = {0, errno.ECONNREFUSED, 10061}
+
+# "time=12.3 ms", "Zeit=12ms", "temps<1ms", "время=12 мс" - the label is localized,
+# the number right after "=" or "<" and the millisecond unit are not
+PING_TIME_PATTERN = re.compile(
+    r"[=<]\s*(\d+(?:[.,]\d+)?)\s*(?:ms|мс)\b", re.IGNORECASE
+)
+PING_TTL_PATTERN = re.compile(r"\bttl\s*=\s*\d+", re.IGNORECASE)
+PING_LOST_PATTERN = re.compile(
+    r"icmp_seq|timed out|unreachable|zeitüberschreitung|délai d'attente"
+    r"|tiempo de espera|unerreichbar|inaccessible|inaccesible",
+    re.IGNORECASE,
+)
+
+
+def classify_response_time(response_time):
+    """Map a response time in milliseconds to (signal bars, status)"""
+    if response_time < 50:
+        return 6, "good"  # All bars, green
+    elif response_time < 100:
+        return 5, "good"  # 5 bars, green
+    elif response_time < 200:
+        return 4, "good"  # 4 bars, green
+    elif response_time < 500:
+        return 3, "slow"  # 3 bars, orange
+    elif response_time < 1000:
+        return 2, "slow"  # 2 bars, orange
+    elif response_time < 2000:
+        return 1, "slow"  # 1 bar, orange
+    else:
+        return 1, "no_connection"  # 1 bar, red
+
+
+def cap_for_loss(bars, status, loss_rate):
+    """Limit (bars, status) by packet loss so fast replies cannot hide a lossy link"""
+    if loss_rate >= 0.5:
+        return 0, "no_connection"
+    if loss_rate >= 0.2:
+        return min(bars, 2), "slow"
+    if loss_rate >= 0.05:
+        return min(bars, 4), status
+    return bars, status
+
+
+def icmp_checksum(data):
+    """Compute the RFC 1071 internet checksum of a packet"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def parse_ping_line(line):
+    """Parse one line of ping output into ("reply", ms), ("lost", None) or None"""
+    if PING_TTL_PATTERN.search(line):
+        match = PING_TIME_PATTERN.search(line)
+        if match:
+            return "reply", float(match.group(1).replace(",", "."))
+    elif PING_LOST_PATTERN.search(line):
+        return "lost", None
+    return None  # Banner, blank or statistics line
+
+
+def hidden_window_options():
+    """Return (startupinfo, creationflags) that keep ping from opening a console"""
+    if platform.system().lower() != "windows":
+        return None, 0
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = subprocess.SW_HIDE
+    return startupinfo, subprocess.CREATE_NO_WINDOW
+
+
+# One burst cycle: RTTs in ms (None where lost) in send order, plus summary figures
+BurstResult = namedtuple("BurstResult", "samples sent received loss min avg max jitter")
+
+
+def summarize_burst(samples):
+    """Build a BurstResult from per-probe RTTs"""
+    answered = [rtt for rtt in samples if rtt is not None]
+    sent = len(samples)
+    if not answered:
+        return BurstResult(samples, sent, 0, 1.0, None, None, None, None)
+    # Mean difference between consecutive answered RTTs
+    steps = [abs(b - a) for a, b in zip(answered, answered[1:])]
+    return BurstResult(
+        samples,
+        sent,
+        len(answered),
+        1 - len(answered) / sent,
+        min(answered),
+        sum(answered) / len(answered),
+        max(answered),
+        sum(steps) / len(steps) if steps else 0.0,
+    )
+
+
+class IcmpProber:
+    """Send ICMP echo requests over one socket kept open for the life of the process"""
+
+    header = struct.Struct("!BBHHH")
+    payload = b"network-status-widget".ljust(32, b".")
+
+    def __init__(self, resolve=None, identifier=None):
+        self.resolve = resolve or socket.gethostbyname
+        self.sock = None
+        self.raw = False
+        # Raw sockets see every reply, so each prober needs its own identifier
+        self.identifier = os.getpid() & 0xFFFF if identifier is None else identifier
+        self.sequence = 0
+        self.open()
+
+    @property
+    def available(self):
+        """Whether a native ICMP socket could be opened"""
+        return self.sock is not None
+
+    def open(self):
+        """Open an unprivileged ICMP socket, falling back to a raw socket"""
+        try:
+            # Linux "ping sockets" (net.ipv4.ping_group_range), no privileges needed
+            self.sock = socket.socket(
+                socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP
+            )
+            self.raw = False
+        except OSError:
+            try:
+                # Needs root / CAP_NET_RAW, or an elevated process on Windows
+                self.sock = socket.socket(
+                    socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP
+                )
+                self.raw = True
+                if platform.system().lower() == "windows":
+                    # Windows rejects recvfrom on a raw socket that is not bound
+                    self.sock.bind(("0.0.0.0", 0))
+            except OSError:
+                if self.sock is not None:
+                    self.sock.close()
+                self.sock = None
+        if self.sock is not None:
+            self.sock.setblocking(False)
+
+    def close(self):
+        """Close the ICMP socket"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def build_packet(self, sequence):
+        """Build an echo request packet for the given sequence number"""
+        header = self.header.pack(
+            ICMP_ECHO_REQUEST, 0, 0, self.identifier, sequence
+        )
+        checksum = icmp_checksum(header + self.payload)
+        header = self.header.pack(
+            ICMP_ECHO_REQUEST, 0, checksum, self.identifier, sequence
+        )
+        return header + self.payload
+
+    def parse_reply(self, data):
+        """Return (identifier, sequence) of an echo reply, or None for other packets"""
+        if self.raw:
+            # Raw sockets deliver the IP header in front of the ICMP message
+            data = data[(data[0] & 0x0F) * 4 :]
+        if len(data) < self.header.size:
+            return None
+        icmp_type, _, _, identifier, sequence = self.header.unpack_from(data)
+        if icmp_type != ICMP_ECHO_REPLY:
+            return None
+        return identifier, sequence
+
+    def next_sequence(self):
+        """Advance and return the 16-bit sequence number"""
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        return self.sequence
+
+    def send_echo(self, address):
+        """Send an echo request to an IPv4 address and return (sequence, sent_ns)"""
+        if self.sock is None:
+            raise OSError("ICMP socket is not available")
+        sequence = self.next_sequence()
+        packet = self.build_packet(sequence)
+        sent = time.perf_counter_ns()
+        self.sock.sendto(packet, (address, 0))
+        return sequence, sent
+
+    def read_replies(self):
+        """Yield (source, sequence, received_ns) for queued replies until the socket is drained"""
+        while self.sock is not None:
+            try:
+                data, source = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            received = time.perf_counter_ns()
+
+            reply = self.parse_reply(data)
+            if reply is None:
+                continue
+            identifier, sequence = reply
+            # The kernel rewrites the identifier of unprivileged ICMP sockets
+            if self.raw and identifier != self.identifier:
+                continue
+            yield source[0], sequence, received
+
+    def ping(self, host, timeout):
+        """Send one echo request and return the RTT in ms, or None on timeout"""
+        if self.sock is None:
+            raise OSError("ICMP socket is not available")
+
+        address = self.resolve(host)
+        sequence, start = self.send_echo(address)
+        deadline = start + int(timeout * 1_000_000_000)
+
+        while True:
+            remaining = (deadline - time.perf_counter_ns()) / 1_000_000_000
+            if remaining <= 0:
+                return None
+            readable, _, _ = select.select([self.sock], [], [], remaining)
+            if not readable:
+                return None
+            for source, reply_sequence, received in self.read_replies():
+                # Anything else is a late reply from an earlier timed-out probe
+                if source == address and reply_sequence == sequence:
+                    return (received - start) / 1_000_000
+
+    def burst(self, host, count, spacing, timeout):
+        """Send `count` echoes `spacing` seconds apart and return a BurstResult
+
+        Replies are matched to their echo by sequence number as they arrive,
+        so a reply that overtakes another is still timed correctly.
+        """
+        if self.sock is None:
+            raise OSError("ICMP socket is not available")
+
+        address = self.resolve(host)
+        sent_at = {}  # sequence -> send time
+        order = []
+        received = {}
+        next_send = time.perf_counter_ns()
+        spacing_ns = int(spacing * 1_000_000_000)
+        timeout_ns = int(timeout * 1_000_000_000)
+
+        while True:
+            now = time.perf_counter_ns()
+            if len(order) < count and now >= next_send:
+                sequence, sent = self.send_echo(address)
+                sent_at[sequence] = sent
+                order.append(sequence)
+                next_send += spacing_ns
+                continue
+            if len(received) == count:
+                break
+            # The last echo gets the full timeout to come back
+            if len(order) == count:
+                wake = sent_at[order[-1]] + timeout_ns
+                if now >= wake:
+                    break
+            else:
+                wake = next_send
+            wait = max(wake - now, 0) / 1_000_000_000
+            if select.select([self.sock], [], [], wait)[0]:
+                for source, sequence, arrival in self.read_replies():
+                    if source == address and sequence in sent_at:
+                        received.setdefault(sequence, arrival - sent_at[sequence])
+
+        samples = [
+            received[sequence] / 1_000_000 if sequence in received else None
+            for sequence in order
+        ]
+        return summarize_burst(samples)
+
+
+def split_endpoint(target, default_port):
+    """Split "host:port" into (host, port), using default_port when none is given"""
+    host, sep, port = target.rpartition(":")
+    if sep and host and ":" not in host and port.isdigit():
+        return host, int(port)
+    return target, default_port
+
+
+class TcpConnectProber:
+    """Time non-blocking TCP handshakes, with many connects in flight at once"""
+
+    def __init__(self, resolve=None):
+        self.resolve = resolve or socket.gethostbyname
+        self.selector = selectors.DefaultSelector()
+
+    def close(self):
+        """Release the selector"""
+        self.selector.close()
+
+    def probe(self, host, port, timeout):
+        """Return the handshake time to host:port in ms, or None on failure"""
+        return self.probe_many([(host, port)], timeout)[0]
+
+    def probe_many(self, endpoints, timeout):
+        """Connect to every (host, port) at once and return their RTTs in ms"""
+        results = [None] * len(endpoints)
+        deadline = time.perf_counter_ns() + int(timeout * 1_000_000_000)
+
+        for index, (host, port) in enumerate(endpoints):
+            try:
+                address = self.resolve(host)
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            except OSError as e:
+                print(f"TCP probe of {host}:{port} failed: {e}")
+                continue
+            sock.setblocking(False)
+            # Reset on close so thousands of probes leave no TIME_WAIT behind
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+            start = time.perf_counter_ns()
+            result = sock.connect_ex((address, port))
+            if result in CONNECT_PENDING:
+                self.selector.register(sock, selectors.EVENT_WRITE, (index, start))
+                continue
+            if result in CONNECT_ANSWERED:
+                results[index] = (time.perf_counter_ns() - start) / 1_000_000
+            sock.close()
+
+        try:
+            while self.selector.get_map():
+                remaining = (deadline - time.perf_counter_ns()) / 1_000_000_000
+                if remaining <= 0:
+                    break
+                for key, _ in self.selector.select(remaining):
+                    finished = time.perf_counter_ns()
+                    index, start = key.data
+                    sock = key.fileobj
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if error in CONNECT_ANSWERED:
+                        results[index] = (finished - start) / 1_000_000
+                    self.selector.unregister(sock)
+                    sock.close()
+        finally:
+            # Handshakes still pending at the deadline count as lost
+            for key in list(self.selector.get_map().values()):
+                self.selector.unregister(key.fileobj)
+                key.fileobj.close()
+        return results
+
+
+# Phase durations of one HTTP probe in ms; connect and tls are 0 on a reused connection
+HttpTiming = namedtuple("HttpTiming", "status connect tls ttfb total reused")
+
+# How a server's close of an idle keep-alive connection surfaces on the next
+# request; only these are retried, never a timeout
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class TimedHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection that records how long the TCP connect took"""
+
+    connect_time = 0.0
+    tls_time = 0.0
+    resolve = staticmethod(socket.gethostbyname)
+
+    def connect(self):
+        address = self.resolve(self.host)
+        start = time.perf_counter_ns()
+        self.sock = socket.create_connection((address, self.port), self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connect_time = (time.perf_counter_ns() - start) / 1_000_000
+        self.tls_time = 0.0
+
+
+class TimedHTTPSConnection(TimedHTTPConnection):
+    """HTTPS connection that records TCP connect and TLS handshake times separately"""
+
+    default_port = http.client.HTTPS_PORT
+
+    def __init__(self, host, port=None, timeout=None, context=None):
+        super().__init__(host, port, timeout)
+        self.ssl_context = context or ssl.create_default_context()
+
+    def connect(self):
+        super().connect()
+        start = time.perf_counter_ns()
+        self.sock = self.ssl_context.wrap_socket(self.sock, server_hostname=self.host)
+        self.tls_time = (time.perf_counter_ns() - start) / 1_000_000
+
+
+class HttpProber:
+    """Probe an HTTP URL over a pooled keep-alive connection per origin"""
+
+    def __init__(self, max_body=4096, resolve=None, ssl_context=None, quiet=False):
+        self.max_body = max_body  # Body bytes read per probe before giving up on reuse
+        self.resolve = resolve or socket.gethostbyname
+        self.ssl_context = ssl_context  # None verifies against the system CAs
+        self.quiet = quiet  # Do not print failed probes, e.g. thousands in a benchmark
+        self.connections = {}
+
+    def close(self):
+        """Close every pooled connection"""
+        for connection in self.connections.values():
+            connection.close()
+        self.connections.clear()
+
+    def connection_for(self, scheme, host, port, timeout):
+        """Return the pooled connection for an origin, creating it if needed"""
+        key = (scheme, host, port)
+        connection = self.connections.get(key)
+        if connection is None:
+            if scheme == "https":
+                connection = TimedHTTPSConnection(
+                    host, port, timeout, self.ssl_context
+                )
+            else:
+                connection = TimedHTTPConnection(host, port, timeout)
+            # Resolve through the cache; TLS still verifies against the hostname
+            connection.resolve = self.resolve
+            self.connections[key] = connection
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def probe(self, url, timeout):
+        """GET the URL and return its HttpTiming, or None if it could not be fetched"""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower() or "http"
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        # A pooled connection the server already closed fails once; retry it fresh
+        for attempt in range(2):
+            connection = self.connection_for(
+                scheme, parts.hostname, parts.port, timeout
+            )
+            reused = connection.sock is not None
+            try:
+                return self.fetch(connection, path, parts.hostname, reused)
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                stale = reused and isinstance(e, STALE_CONNECTION_ERRORS)
+                if not stale or attempt:
+                    if not self.quiet:
+                        print(f"HTTP probe of {url} failed: {e}")
+                    return None
+        return None
+
+    def fetch(self, connection, path, host, reused):
+        """Send one request on the connection and time its phases"""
+        start = time.perf_counter_ns()
+        if not reused:
+            connection.connect()
+        connection.putrequest("GET", path, skip_accept_encoding=True)
+        connection.putheader("User-Agent", "NetworkStatusWidget")
+        connection.putheader("Connection", "keep-alive")
+        connection.endheaders()
+        sent = time.perf_counter_ns()
+        response = connection.getresponse()
+        first_byte = time.perf_counter_ns()
+
+        response.read(self.max_body)
+        if not response.isclosed():
+            # Body is larger than the cap, so the connection cannot be reused
+            connection.close()
+        elif response.will_close:
+            connection.close()
+        finished = time.perf_counter_ns()
+
+        connect_time = 0.0 if reused else connection.connect_time
+        tls_time = 0.0 if reused else connection.tls_time
+        return HttpTiming(
+            response.status,
+            connect_time,
+            tls_time,
+            (first_byte - sent) / 1_000_000,
+            (finished - start) / 1_000_000,
+            reused,
+        )
+
+
+def read_lines(stream):
+    """Yield lines from a text stream until it is closed"""
+    for line in iter(stream.readline, ""):
+        yield line
+
+
+def parse_samples(lines):
+    """Yield the RTT in ms of every reply line, or None for every lost probe"""
+    for line in lines:
+        parsed = parse_ping_line(line)
+        if parsed is not None:
+            yield parsed[1]
+
+
+def ping_command(host, timeout):
+    """Build the single-echo ping command line for this platform"""
+    if platform.system().lower() == "windows":
+        return ["ping", "-n", "1", "-w", str(int(timeout * 1000)), host]
+    return ["ping", "-c", "1", "-W", str(timeout), host]
+
+
+def ping_once(host, timeout):
+    """Run ping for one echo and return the RTT in ms, or None if it was lost"""
+    startupinfo, creation_flags = hidden_window_options()
+    try:
+        output = subprocess.run(
+            ping_command(host, timeout),
+            capture_output=True,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+            timeout=timeout + 1,
+            startupinfo=startupinfo,
+            creationflags=creation_flags,
+        ).stdout
+    except subprocess.TimeoutExpired:
+        return None
+    for line in output.splitlines():
+        parsed = parse_ping_line(line)
+        if parsed is not None:
+            return parsed[1]
+    return None
+
+
+class StreamingPing:
+    """Keep one continuous ping process running and expose its latest sample
+
+    Only where ping can space its echoes; Windows ping sends one per second
+    whatever the interval, so callers use ping_once there instead.
+    """
+
+    supported = platform.system().lower() != "windows"
+
+    def __init__(self):
+        self.process = None
+        self.key = None
+        self.condition = threading.Condition()
+        self.latest = None
+        self.sample_count = 0
+        self.consumed = 0
+
+    @staticmethod
+    def command(host, interval, timeout):
+        """Build the continuous ping command line"""
+        # -O reports a missing reply before the next echo goes out
+        return ["ping", "-O", "-i", str(interval), "-W", str(timeout), host]
+
+    def ensure(self, host, interval, timeout):
+        """Start the process, restarting it if the target or cadence changed
+
+        The caller passes the interval actually in effect (adaptive, battery
+        throttled), so the process never pings faster than the schedule.
+        """
+        key = (host, interval, timeout)
+        if self.process is not None and self.process.poll() is None:
+            if key == self.key:
+                return
+        self.stop()
+        startupinfo, creation_flags = hidden_window_options()
+        self.process = subprocess.Popen(
+            self.command(host, interval, timeout),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            startupinfo=startupinfo,
+            creationflags=creation_flags,
+        )
+        self.key = key
+        with self.condition:
+            self.latest = None
+            self.consumed = self.sample_count
+        threading.Thread(
+            target=self.read_samples, args=(self.process,), daemon=True
+        ).start()
+
+    def read_samples(self, process):
+        """Background reader feeding samples from the process output"""
+        for sample in parse_samples(read_lines(process.stdout)):
+            with self.condition:
+                if process is not self.process:
+                    return  # Superseded by a restart
+                self.latest = sample
+                self.sample_count += 1
+                self.condition.notify_all()
+        with self.condition:
+            self.condition.notify_all()
+
+    def sample(self, host, interval, timeout):
+        """Return the newest unseen RTT in ms, or None if the probe was lost"""
+        self.ensure(host, interval, timeout)
+        process = self.process
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.sample_count > self.consumed
+                or process.poll() is not None,
+                timeout=interval + timeout + 1,
+            )
+            if self.sample_count == self.consumed:
+                return None
+            self.consumed = self.sample_count
+            return self.latest
+
+    def stop(self):
+        """Terminate the ping process"""
+        process, self.process = self.process, None
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if process is not None and process.stdout is not None:
+            process.stdout.close()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Probe scheduler for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Keeps probes on a fixed cadence measured against monotonic deadlines, so the
+period does not stretch by the time each probe takes.
+"""
+
+import random
+import threading
+import time
+
+
+class AdaptiveInterval:
+    """Back off while the link stays good and tighten as soon as it degrades"""
+
+    def __init__(self, base, fast, ceiling, growth=2.0):
+        self.growth = growth
+        self.base = self.fast = self.ceiling = None
+        self.configure(base, fast, ceiling)
+        self.probes_sent = 0
+        self.elapsed = 0.0
+
+    def configure(self, base, fast, ceiling):
+        """Set the fixed interval being replaced and the adaptive bounds
+
+        The current back-off is kept unless one of them actually changed.
+        """
+        fast = min(fast, ceiling)
+        if (base, fast, ceiling) == (self.base, self.fast, self.ceiling):
+            return
+        self.base = base
+        self.fast = fast
+        self.ceiling = ceiling
+        self.current = min(max(base, self.fast), ceiling)
+
+    def reset(self):
+        """Start over from the fast interval, e.g. after the network changed"""
+        self.current = self.fast
+
+    def next_interval(self, status):
+        """Record a probe with its status and return the interval until the next one"""
+        if status == "good":
+            self.current = min(self.current * self.growth, self.ceiling)
+        else:
+            # Confirm (or clear) a suspected outage quickly
+            self.current = self.fast
+        self.probes_sent += 1
+        self.elapsed += self.current
+        return self.current
+
+    @property
+    def probes_saved(self):
+        """Probes a fixed `base` interval would have sent beyond those actually sent
+
+        Zero, not negative, after a bad spell spent probing faster than `base`.
+        """
+        return max(int(self.elapsed / self.base) - self.probes_sent, 0)
+
+
+class ProbeScheduler:
+    """Fixed-cadence deadline scheduler that can be woken early"""
+
+    def __init__(self, interval, jitter=0.0):
+        self.condition = threading.Condition()
+        self.interval = interval
+        self.jitter = jitter  # Random delay of up to this many seconds per slot
+        self.stopped = False
+        self.wake_reason = None
+        self.cycles = 0
+        self.lateness = 0.0  # Seconds the last deadline fired after it was due
+        # The caller probes once before its first wait, which opens the first slot
+        self.slot = time.monotonic()
+        self.offset = 0.0  # Jitter applied to the next slot
+
+    def next_deadline(self):
+        """Monotonic time at which the next probe is due"""
+        return self.slot + self.interval + self.offset
+
+    def set_pace(self, interval):
+        """Change the cadence from the current slot on, without probing early"""
+        with self.condition:
+            self.interval = interval
+            self.condition.notify_all()
+
+    def set_interval(self, interval, jitter=None):
+        """Change the cadence and probe immediately so it takes effect now"""
+        with self.condition:
+            self.interval = interval
+            if jitter is not None:
+                self.jitter = jitter
+        self.wake("settings")
+
+    def wake(self, reason="manual"):
+        """Cut the current wait short"""
+        with self.condition:
+            self.wake_reason = reason
+            self.condition.notify_all()
+
+    def stop(self):
+        """Stop scheduling and release any waiting thread"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def wait(self):
+        """Block until the next probe is due; return its reason, or None once stopped"""
+        with self.condition:
+            while not self.stopped and self.wake_reason is None:
+                remaining = self.next_deadline() - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            if self.stopped:
+                return None
+
+            now = time.monotonic()
+            reason = self.wake_reason or "deadline"
+            self.wake_reason = None
+            if reason == "deadline":
+                self.lateness = now - self.next_deadline()
+                self.slot += self.interval
+                if now - self.slot >= self.interval:
+                    # Probes overran whole periods; skip the missed slots
+                    self.slot += (now - self.slot) // self.interval * self.interval
+            else:
+                # Early wake starts a fresh cadence from this probe
+                self.lateness = 0.0
+                self.slot = now
+            self.offset = random.uniform(0, self.jitter) if self.jitter > 0 else 0.0
+            return reason
+
+    def cycle_done(self):
+        """Record that a probe cycle finished"""
+        with self.condition:
+            self.cycles += 1
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Settings persistence for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Keeps the settings file in a fixed per-user location, writes it atomically on
+a background thread shortly after the last change, and notices when someone
+edits it by hand so the new values apply without a restart.
+"""
+
+import ctypes
+import json
+import os
+import select
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+
+# Where the settings lived before they moved to the per-user directory
+LEGACY_SETTINGS_FILE = "network_widget_settings.json"
+
+# inotify flags
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+
+# wd, mask, cookie, name length
+inotify_event = struct.Struct("iIII")
+
+
+def default_config_dir():
+    """Per-user directory for the widget's settings"""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "NetworkStatusWidget")
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(base, "network-status-widget")
+
+
+def default_settings_path():
+    return os.path.join(default_config_dir(), "settings.json")
+
+
+def file_signature(path):
+    """(mtime, size) of a file, or None when it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def atomic_write_json(path, data):
+    """Write JSON so readers see either the old file or the new one, never half"""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def coerce_setting(value, default):
+    """Convert an edited value to the type of its default, or raise ValueError"""
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        raise ValueError("expected true or false")
+    if isinstance(default, (int, float)):
+        if isinstance(value, bool):
+            raise ValueError("expected a number")
+        if isinstance(value, str):
+            try:
+                value = float(value) if "." in value else int(value)
+            except ValueError:
+                raise ValueError("expected a number") from None
+        if not isinstance(value, (int, float)) or value != value or value < 0:
+            raise ValueError("expected a number of at least 0")
+        return value
+    if isinstance(default, str):
+        if not isinstance(value, str):
+            raise ValueError("expected a string")
+        return value
+    if isinstance(default, list):
+        if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+            raise ValueError("expected a list of strings")
+        return value
+    return value
+
+
+def validate_settings(settings, defaults, integers=(), positive=()):
+    """Coerce settings to the types of their defaults
+
+    Returns (valid settings, [error messages]); keys that fail are left out
+    of the valid settings. Keys without a default pass through unchanged. The
+    numbers named in `integers` must be whole, those in `positive` above zero.
+    """
+    valid = {}
+    errors = []
+    for key, value in settings.items():
+        if key not in defaults:
+            valid[key] = value
+            continue
+        original = value
+        try:
+            value = coerce_setting(value, defaults[key])
+            if key in integers:
+                if value != int(value):
+                    raise ValueError("expected a whole number")
+                value = int(value)
+            if key in positive and value <= 0:
+                raise ValueError("expected a number above 0")
+        except ValueError as e:
+            errors.append(f"{key}: {e}, got {original!r}")
+            continue
+        valid[key] = value
+    return valid, errors
+
+
+class InotifyWatch:
+    """Linux inotify watch on one directory, read through ctypes"""
+
+    def __init__(self, directory):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def fileno(self):
+        return self.fd
+
+    def names(self):
+        """Names of the files changed since the last call"""
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + inotify_event.size <= len(data):
+                _, _, _, length = inotify_event.unpack_from(data, offset)
+                offset += inotify_event.size
+                names.add(os.fsdecode(data[offset : offset + length].rstrip(b"\0")))
+                offset += length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SettingsStore:
+    """One settings file with debounced background saves and change watching"""
+
+    def __init__(self, path=None, debounce=0.5, poll_interval=5.0):
+        # Absolute, so a relative --settings still has a directory to write to
+        self.path = os.path.abspath(path or default_settings_path())
+        self.debounce = debounce  # Saves within this many seconds are merged
+        self.poll_interval = poll_interval  # mtime polling where inotify is missing
+        self.condition = threading.Condition()
+        self.pending = None  # Snapshot waiting to be written
+        self.pending_since = 0.0
+        self.writer = None
+        self.closed = False
+        self.known_signature = None  # File state last read or written by us
+        self.watcher = None
+        self.stopped = threading.Event()
+        self.wakeup_read, self.wakeup_write = os.pipe()
+
+    def load(self):
+        """Return the saved settings, migrating the legacy file the first time"""
+        path = self.path
+        if not os.path.exists(path) and os.path.exists(LEGACY_SETTINGS_FILE):
+            path = LEGACY_SETTINGS_FILE
+        with open(path, "r") as f:
+            settings = json.load(f)
+        if path == self.path:
+            self.known_signature = file_signature(path)
+        else:
+            # Written at once, so the old file is only removed once it is safe
+            self.write(settings)
+            if self.known_signature is not None:
+                try:
+                    os.remove(path)
+                    print(f"Moved settings to {self.path}")
+                except OSError as e:
+                    print(f"Copied settings to {self.path}, keeping {path}: {e}")
+        return settings
+
+    def save(self, settings):
+        """Queue a snapshot of settings to be written once changes settle"""
+        with self.condition:
+            self.pending = dict(settings)
+            self.pending_since = time.monotonic()
+            if self.writer is None and not self.closed:
+                self.writer = threading.Thread(target=self.write_loop, daemon=True)
+                self.writer.start()
+            self.condition.notify_all()
+
+    def flush(self):
+        """Write any queued snapshot now, on the calling thread"""
+        with self.condition:
+            snapshot, self.pending = self.pending, None
+        if snapshot is not None:
+            self.write(snapshot)
+
+    def write(self, settings):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            atomic_write_json(self.path, settings)
+            self.known_signature = file_signature(self.path)
+        except Exception as e:
+            print(f"Error saving settings: {e}")
+
+    def write_loop(self):
+        """Writer thread: wait for saves to settle, then write the newest snapshot"""
+        with self.condition:
+            while True:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                remaining = self.pending_since + self.debounce - time.monotonic()
+                if remaining > 0 and not self.closed:
+                    self.condition.wait(remaining)
+                    continue
+                snapshot, self.pending = self.pending, None
+                self.condition.release()
+                try:
+                    self.write(snapshot)
+                finally:
+                    self.condition.acquire()
+
+    def watch(self, on_change):
+        """Call on_change(settings) from a background thread after outside edits"""
+        self.watcher = threading.Thread(
+            target=self.watch_loop, args=(on_change,), daemon=True
+        )
+        self.watcher.start()
+
+    def watch_loop(self, on_change):
+        inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                inotify = InotifyWatch(os.path.dirname(self.path))
+            except (OSError, AttributeError) as e:
+                print(f"Watching settings by polling: {e}")
+        name = os.path.basename(self.path)
+        try:
+            while not self.stopped.is_set():
+                if inotify is not None:
+                    readable, _, _ = select.select([inotify, self.wakeup_read], [], [])
+                    if inotify not in readable or name not in inotify.names():
+                        continue
+                    time.sleep(0.1)  # Let an editor finish its write-and-rename
+                elif self.stopped.wait(self.poll_interval):
+                    break
+                try:
+                    self.reload(on_change)
+                except Exception as e:
+                    # Keep watching, so a later corrected edit still applies
+                    print(f"Error applying edited settings: {e}")
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def reload(self, on_change):
+        """Read the file if it changed since we last saw it and pass it on"""
+        signature = file_signature(self.path)
+        if signature is None or signature == self.known_signature:
+            return  # Gone, or our own write
+        try:
+            with open(self.path, "r") as f:
+                settings = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable settings file: {e}")
+            return
+        self.known_signature = signature
+        if isinstance(settings, dict):
+            on_change(settings)
+
+    def close(self, timeout=5.0):
+        """Stop watching and write anything still queued
+
+        Waits for a write already in progress, so an older snapshot cannot
+        replace the file after the final one.
+        """
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        try:
+            os.write(self.wakeup_write, b"\0")
+        except OSError:
+            pass
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        current = threading.current_thread()
+        if self.writer is not None and self.writer is not current:
+            self.writer.join(timeout)
+        if self.writer is None or not self.writer.is_alive():
+            self.flush()
+        if self.watcher is not None and self.watcher is not current:
+            self.watcher.join(timeout)
+        if self.watcher is None or not self.watcher.is_alive():
+            os.close(self.wakeup_read)
+            os.close(self.wakeup_write)
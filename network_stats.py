@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Rolling statistics for the Network Status Widget
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Smooths raw probe samples so a single outlier does not repaint the tray icon,
+and folds them into fixed-size minute, hour and day rollups for long-term figures.
+"""
+
+import math
+from array import array
+from bisect import bisect_left, insort
+from collections import deque, namedtuple
+
+from network_probes import cap_for_loss, classify_response_time
+
+
+class RollingStats:
+    """Fixed-size window of recent samples with incrementally kept metrics
+
+    Memory is two arrays of `size` doubles no matter how long the widget runs.
+    """
+
+    def __init__(self, size=60, alpha=0.2):
+        self.size = size
+        self.alpha = alpha  # EWMA weight of the newest sample
+        self.reset()
+
+    def reset(self):
+        """Forget every sample, e.g. after the network changed underneath us"""
+        self.samples = array("d", [math.nan] * self.size)  # Ring, NaN = lost probe
+        self.ordered = array("d")  # Answered RTTs of the window, kept sorted
+        self.index = 0
+        self.count = 0
+        self.lost = 0
+        self.consecutive_lost = 0
+        self.ewma = None
+        self.jitter = 0.0
+        self.previous = None
+
+    def add(self, response_time):
+        """Add one sample: an RTT in ms, or None for a lost probe"""
+        if self.count == self.size:
+            old = self.samples[self.index]
+            if math.isnan(old):
+                self.lost -= 1
+            else:
+                del self.ordered[bisect_left(self.ordered, old)]
+        else:
+            self.count += 1
+
+        if response_time is None:
+            self.samples[self.index] = math.nan
+            self.lost += 1
+            self.consecutive_lost += 1
+        else:
+            self.samples[self.index] = response_time
+            insort(self.ordered, response_time)
+            self.consecutive_lost = 0
+            if self.ewma is None:
+                self.ewma = response_time
+            else:
+                # Limit how far one spike can drag the average; a sustained
+                # rise still doubles the ceiling on every sample
+                limited = min(response_time, 2 * self.ewma + 4 * self.jitter)
+                self.ewma += self.alpha * (limited - self.ewma)
+            if self.previous is not None:
+                # RFC 3550 interarrival jitter, smoothed by 1/16
+                self.jitter += (abs(response_time - self.previous) - self.jitter) / 16
+            self.previous = response_time
+        self.index = (self.index + 1) % self.size
+
+    @property
+    def loss_rate(self):
+        """Fraction of the window's probes that got no reply"""
+        return self.lost / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of answered RTTs in the window, or None"""
+        if not self.ordered:
+            return None
+        rank = max(math.ceil(percent / 100 * len(self.ordered)), 1)
+        return self.ordered[rank - 1]
+
+
+class SignalSmoother:
+    """Derive (bars, status) from rolling metrics, with hysteresis between levels"""
+
+    def __init__(self, size=60, margin=0.15, outage_after=2):
+        self.stats = RollingStats(size)
+        self.margin = margin  # RTT must clear a threshold by this fraction to move
+        self.outage_after = outage_after  # Consecutive losses that mean "down"
+        self.level = None  # Latency-derived (bars, status) before loss caps
+        self.bars = 0
+        self.status = "unknown"
+
+    def reset(self):
+        """Drop history and show the next sample as it is"""
+        self.stats.reset()
+        self.level = None
+        self.bars = 0
+        self.status = "unknown"
+
+    def update(self, response_time):
+        """Add a sample and return the smoothed (bars, status)"""
+        stats = self.stats
+        stats.add(response_time)
+
+        if stats.ewma is None or stats.consecutive_lost >= self.outage_after:
+            self.level = None  # Recovery is shown as soon as it happens
+            self.bars, self.status = 0, "no_connection"
+            return self.bars, self.status
+
+        bars, status = classify_response_time(stats.ewma)
+        if self.level is not None and bars != self.level[0]:
+            # Only move when the level still differs with the margin applied
+            # toward the current one, so RTT hovering at a threshold cannot flap
+            factor = 1 - self.margin if bars < self.level[0] else 1 + self.margin
+            nudged_bars, _ = classify_response_time(stats.ewma * factor)
+            if (nudged_bars - self.level[0]) * (bars - self.level[0]) <= 0:
+                bars, status = self.level
+        self.level = bars, status
+
+        # Sustained loss caps the level even when replies are fast
+        self.bars, self.status = cap_for_loss(bars, status, stats.loss_rate)
+        return self.bars, self.status
+
+
+ROLLUP_STATUSES = ("unknown", "good", "slow", "no_connection")
+STATUS_INDEX = {status: index for index, status in enumerate(ROLLUP_STATUSES)}
+
+# name, bucket width in seconds, buckets retained
+ROLLUP_TIERS = (("minute", 60, 1440), ("hour", 3600, 168), ("day", 86400, 365))
+
+# Which tier answers each summary span
+ROLLUP_SPANS = {
+    "hour": ("minute", 3600),
+    "day": ("hour", 86400),
+    "week": ("hour", 604800),
+}
+
+RollupSummary = namedtuple(
+    "RollupSummary", "count lost rtt_min rtt_max rtt_mean uptime status_time"
+)
+
+
+class RollupBucket:
+    """Aggregates of every sample that fell in one time bucket"""
+
+    __slots__ = (
+        "start",
+        "count",
+        "lost",
+        "rtt_sum",
+        "rtt_min",
+        "rtt_max",
+        "status_time",
+    )
+
+    def __init__(self, start):
+        self.start = start
+        self.count = 0
+        self.lost = 0
+        self.rtt_sum = 0.0
+        self.rtt_min = math.inf
+        self.rtt_max = 0.0
+        self.status_time = [0.0] * len(ROLLUP_STATUSES)  # Seconds per status
+
+    def add(self, response_time, status_index, duration):
+        self.count += 1
+        if response_time is None:
+            self.lost += 1
+        else:
+            self.rtt_sum += response_time
+            self.rtt_min = min(self.rtt_min, response_time)
+            self.rtt_max = max(self.rtt_max, response_time)
+        self.status_time[status_index] += duration
+
+
+class RollupTier:
+    """Ring of fixed-width buckets plus the bucket being filled"""
+
+    def __init__(self, width, retention):
+        self.width = width
+        self.buckets = deque(maxlen=retention)  # Oldest fall off as new ones close
+        self.current = None
+
+    def add(self, timestamp, response_time, status_index, duration):
+        start = timestamp - timestamp % self.width
+        if self.current is None or start > self.current.start:
+            if self.current is not None:
+                self.buckets.append(self.current)
+            self.current = RollupBucket(start)
+        self.current.add(response_time, status_index, duration)
+
+    def buckets_since(self, since):
+        """Yield the buckets overlapping [since, now), newest first"""
+        if self.current is not None and self.current.start + self.width > since:
+            yield self.current
+        for bucket in reversed(self.buckets):
+            if bucket.start + self.width <= since:
+                return
+            yield bucket
+
+
+class Rollups:
+    """Incremental multi-resolution downsampler with bounded memory"""
+
+    def __init__(self, max_gap=300):
+        self.tiers = {
+            name: RollupTier(width, retention)
+            for name, width, retention in ROLLUP_TIERS
+        }
+        self.max_gap = max_gap  # Longer silences (app closed, asleep) are not counted
+        self.last_time = None
+        self.last_status = None
+
+    def add(self, timestamp, response_time, status):
+        """Fold one sample into every tier"""
+        if self.last_time is not None and timestamp < self.last_time:
+            return  # Out of order, e.g. a clock step backwards
+        # The time since the previous sample is spent in the previous status
+        duration = 0.0
+        status_index = STATUS_INDEX.get(status, 0)
+        if self.last_time is not None:
+            duration = min(timestamp - self.last_time, self.max_gap)
+            status_index_spent = STATUS_INDEX.get(self.last_status, 0)
+        else:
+            status_index_spent = status_index
+        for tier in self.tiers.values():
+            tier.add(timestamp, response_time, status_index_spent, duration)
+        self.last_time = timestamp
+        self.last_status = status
+
+    def summary(self, span, now):
+        """Summarise the last hour, day or week from the matching tier"""
+        tier_name, seconds = ROLLUP_SPANS[span]
+        count = lost = 0
+        rtt_sum = 0.0
+        rtt_min = math.inf
+        rtt_max = 0.0
+        status_time = [0.0] * len(ROLLUP_STATUSES)
+        for bucket in self.tiers[tier_name].buckets_since(now - seconds):
+            count += bucket.count
+            lost += bucket.lost
+            rtt_sum += bucket.rtt_sum
+            rtt_min = min(rtt_min, bucket.rtt_min)
+            rtt_max = max(rtt_max, bucket.rtt_max)
+            for index, seconds_in_status in enumerate(bucket.status_time):
+                status_time[index] += seconds_in_status
+
+        answered = count - lost
+        known = sum(status_time) - status_time[STATUS_INDEX["unknown"]]
+        up = status_time[STATUS_INDEX["good"]] + status_time[STATUS_INDEX["slow"]]
+        return RollupSummary(
+            count,
+            lost,
+            rtt_min if answered else None,
+            rtt_max if answered else None,
+            rtt_sum / answered if answered else None,
+            up / known if known else None,
+            dict(zip(ROLLUP_STATUSES, status_time)),
+        )
@@ -8,79 +8,60 @@ GitHub: github.com/mrbeandev
 A Windows taskbar widget that shows network connectivity status using signal bars.
 """
 
-import tkinter as tk
-from tkinter import messagebox, simpledialog
-import threading
-import time
+import argparse
 import json
 import os
+import queue
 import sys
-import subprocess
-import platform
-from PIL import Image, ImageDraw
-import pystray
-from pystray import MenuItem as item
-import io
-
-
-class NetworkTaskbarWidget:
-    def __init__(self):
-        self.load_settings()
-        self.setup_variables()
+import threading
+import time
+from urllib.parse import urlsplit
+
+from network_engine import AGGREGATE_MODES
+from network_monitor import NetworkMonitor, run_headless
+from network_path import LAYER_TEXT
+
+# tkinter, Pillow and pystray are imported where they are first used, so the
+# headless mode never loads them
+
+
+PROBE_MODES = ("icmp", "tcp", "http")
+
+
+class NetworkTaskbarWidget(NetworkMonitor):
+    def __init__(self, settings_file=None):
+        super().__init__(settings_file)
+        self.dialog_commands = queue.Queue()
+        self.dialog_thread = None
+        self.dialog_lock = threading.Lock()
         self.create_tray_icon()
         self.start_monitoring()
 
-    def load_settings(self):
-        """Load settings from config file"""
-        self.settings_file = "network_widget_settings.json"
-        default_settings = {
-            "ping_host": "8.8.8.8",  # Google DNS
-            "ping_interval": 3,  # seconds
-            "timeout": 3,
-            "signal_bars": 6,
-        }
+    def on_sample(self, sample):
+        """Show every check's result in the tray"""
+        super().on_sample(sample)
+        self.update_tray_icon()
 
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, "r") as f:
-                    self.settings = {**default_settings, **json.load(f)}
-            else:
-                self.settings = default_settings
-                self.save_settings()
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-            self.settings = default_settings
-
-    def save_settings(self):
-        """Save current settings to file"""
-        try:
-            with open(self.settings_file, "w") as f:
-                json.dump(self.settings, f, indent=2)
-        except Exception as e:
-            print(f"Error saving settings: {e}")
-
-    def setup_variables(self):
-        """Initialize variables"""
-        self.current_signal_strength = 0  # 0-6 bars
-        self.current_status = "unknown"  # unknown, good, slow, no_connection
-        self.monitoring = True
-        self.last_response_time = 0
+    # Create 48x48 icon (larger for better visibility)
+    ICON_SIZE = 48
+
+    # Define colors with better contrast
+    STATUS_COLORS = {
+        "good": (0, 220, 0, 255),  # Bright Green
+        "slow": (255, 140, 0, 255),  # Orange
+        "no_connection": (220, 0, 0, 255),  # Red
+        "unknown": (120, 120, 120, 255),  # Gray
+    }
 
     def create_signal_icon(self, bars_filled, status_color):
         """Create a signal strength icon with specified bars and color"""
-        # Create 48x48 icon (larger for better visibility)
-        size = 48
+        from PIL import Image, ImageDraw
+
+        size = self.ICON_SIZE
         image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
         draw = ImageDraw.Draw(image)
 
-        # Define colors with better contrast
-        colors = {
-            "good": (0, 220, 0, 255),  # Bright Green
-            "slow": (255, 140, 0, 255),  # Orange
-            "no_connection": (220, 0, 0, 255),  # Red
-            "unknown": (120, 120, 120, 255),  # Gray
-        }
-
+        colors = self.STATUS_COLORS
         active_color = colors.get(status_color, colors["unknown"])
         inactive_color = (80, 80, 80, 180)  # Darker gray, more visible
 
@@ -109,86 +90,40 @@ class NetworkTaskbarWidget:
 
         return image
 
-    def check_network_status(self):
-        """Check network status by pinging Google DNS (8.8.8.8)"""
-        import subprocess
-        import platform
-        
-        try:
-            # Use ping command based on OS
-            if platform.system().lower() == "windows":
-                # Windows ping command
-                cmd = ["ping", "-n", "1", "-w", str(self.settings["timeout"] * 1000), self.settings["ping_host"]]
-                # Hide console window on Windows
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-                creation_flags = subprocess.CREATE_NO_WINDOW
-            else:
-                # Unix-like systems
-                cmd = ["ping", "-c", "1", "-W", str(self.settings["timeout"]), self.settings["ping_host"]]
-                startupinfo = None
-                creation_flags = 0
-            
-            start_time = time.time()
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                timeout=self.settings["timeout"] + 1,
-                startupinfo=startupinfo,
-                creationflags=creation_flags
-            )
-            end_time = time.time()
-            
-            if result.returncode == 0:
-                # Parse ping time from output
-                output = result.stdout.lower()
-                response_time = (end_time - start_time) * 1000  # Default fallback
-                
-                # Try to extract actual ping time from output
-                if "time=" in output:
-                    try:
-                        time_part = output.split("time=")[1].split()[0]
-                        if "ms" in time_part:
-                            response_time = float(time_part.replace("ms", ""))
-                        else:
-                            response_time = float(time_part)
-                    except (IndexError, ValueError):
-                        pass  # Use fallback time
-                
-                self.last_response_time = response_time
-
-                # Determine signal strength and status based on response time
-                if response_time < 50:
-                    return 6, "good"  # All bars, green
-                elif response_time < 100:
-                    return 5, "good"  # 5 bars, green
-                elif response_time < 200:
-                    return 4, "good"  # 4 bars, green
-                elif response_time < 500:
-                    return 3, "slow"  # 3 bars, orange
-                elif response_time < 1000:
-                    return 2, "slow"  # 2 bars, orange
-                elif response_time < 2000:
-                    return 1, "slow"  # 1 bar, orange
-                else:
-                    return 1, "no_connection"  # 1 bar, red
-            else:
-                return 0, "no_connection"
-
-        except subprocess.TimeoutExpired:
-            print("Ping timeout")
-            return 0, "no_connection"
-        except Exception as e:
-            print(f"Network check failed: {e}")
-            return 0, "no_connection"
+    def icon_key(self, bars_filled, status_color):
+        """Cache key identifying one rendered icon"""
+        return (
+            bars_filled,
+            status_color,
+            self.settings["signal_bars"],
+            self.ICON_SIZE,
+        )
+
+    def prerender_icons(self):
+        """Render every (bars, status) icon for the current bar count up front"""
+        self.icon_cache = {}
+        for status_color in self.STATUS_COLORS:
+            for bars_filled in range(self.settings["signal_bars"] + 1):
+                key = self.icon_key(bars_filled, status_color)
+                self.icon_cache[key] = self.create_signal_icon(
+                    bars_filled, status_color
+                )
+        self.icon_cache_bars = self.settings["signal_bars"]
+
+    def get_signal_icon(self, bars_filled, status_color):
+        """Return the cached icon for a state, rendering it only on a miss"""
+        if self.icon_cache_bars != self.settings["signal_bars"]:
+            self.prerender_icons()  # Bar count changed, old icons are stale
+        key = self.icon_key(bars_filled, status_color)
+        icon_image = self.icon_cache.get(key)
+        if icon_image is None:
+            icon_image = self.create_signal_icon(bars_filled, status_color)
+            self.icon_cache[key] = icon_image
+        return icon_image
 
     def update_tray_icon(self):
         """Update the system tray icon with current network status"""
-        icon_image = self.create_signal_icon(
-            self.current_signal_strength, self.current_status
-        )
+        icon_key = self.icon_key(self.current_signal_strength, self.current_status)
 
         # Update tooltip text
         status_text = {
@@ -204,16 +139,41 @@ class NetworkTaskbarWidget:
         tooltip += (
             f"\nBars: {self.current_signal_strength}/{self.settings['signal_bars']}"
         )
+        tooltip += self.dns_status_text()
+        tooltip += self.path_text()
 
-        # Update the tray icon
+        # Update the tray icon, only touching what changed since each
+        # assignment makes pystray rebuild the native icon
         if hasattr(self, "tray_icon"):
-            self.tray_icon.icon = icon_image
-            self.tray_icon.title = tooltip
+            diagnostics = self.diagnostics
+            if diagnostics is not None:
+                started = time.perf_counter()
+            if icon_key != self.displayed_icon_key:
+                icon_image = self.get_signal_icon(
+                    self.current_signal_strength, self.current_status
+                )
+                if diagnostics is not None:
+                    rendered = time.perf_counter()
+                    diagnostics.record("render", rendered - started)
+                    started = rendered
+                self.tray_icon.icon = icon_image
+                self.displayed_icon_key = icon_key
+            if tooltip != self.displayed_tooltip:
+                self.tray_icon.title = tooltip
+                self.displayed_tooltip = tooltip
+            if diagnostics is not None:
+                diagnostics.record("tray", time.perf_counter() - started)
 
     def create_tray_icon(self):
         """Create the system tray icon"""
+        import pystray
+        from pystray import MenuItem as item
+
         # Initial icon
-        initial_icon = self.create_signal_icon(0, "unknown")
+        self.prerender_icons()
+        initial_icon = self.get_signal_icon(0, "unknown")
+        self.displayed_icon_key = self.icon_key(0, "unknown")
+        self.displayed_tooltip = "Network Status Widget"
 
         # Create context menu
         menu = pystray.Menu(
@@ -228,15 +188,70 @@ class NetworkTaskbarWidget:
                     item("10 seconds", lambda: self.set_ping_interval(10)),
                     item("30 seconds", lambda: self.set_ping_interval(30)),
                     item("Custom...", self.set_custom_interval),
+                    pystray.Menu.SEPARATOR,
+                    item(
+                        lambda menu_item: (
+                            f"Adaptive ({self.settings['adaptive_min_interval']}s"
+                            f" - {self.settings['adaptive_max_interval']}s)"
+                        ),
+                        self.toggle_adaptive_interval,
+                        checked=lambda menu_item: self.settings["adaptive_interval"],
+                    ),
+                    item("Adaptive Bounds...", self.set_adaptive_bounds),
                 ),
             ),
+            item(
+                "Multi-target Mode",
+                pystray.Menu(
+                    *(self.create_aggregate_mode_item(mode) for mode in AGGREGATE_MODES)
+                ),
+                visible=lambda item: bool(self.settings["targets"]),
+            ),
             item(
                 "Settings",
                 pystray.Menu(
                     item("Set Timeout...", self.set_timeout),
+                    item(
+                        "Probe Mode",
+                        pystray.Menu(
+                            *(self.create_probe_mode_item(mode) for mode in PROBE_MODES),
+                            pystray.Menu.SEPARATOR,
+                            item("TCP Port...", self.set_tcp_port),
+                            item("HTTP URL...", self.set_http_url),
+                        ),
+                    ),
+                    item(
+                        "Burst Probes",
+                        pystray.Menu(
+                            *(self.create_burst_item(count) for count in (1, 5, 10, 20))
+                        ),
+                    ),
+                    item(
+                        "Power Saving",
+                        self.toggle_power_saving,
+                        checked=lambda menu_item: self.settings["power_saving"],
+                    ),
                     item("Test Connection", self.test_connection),
                 ),
             ),
+            item(
+                "Diagnostics",
+                pystray.Menu(
+                    item("Show Diagnostics", self.show_diagnostics),
+                    item(
+                        "Record Cycle Timings",
+                        self.toggle_diagnostics,
+                        checked=lambda menu_item: self.diagnostics is not None,
+                    ),
+                    item(
+                        lambda menu_item: (
+                            f"Profile {self.settings['profile_cycles']} Cycles"
+                        ),
+                        self.profile_cycles,
+                        enabled=lambda menu_item: self.profile_capture is None,
+                    ),
+                ),
+            ),
             pystray.Menu.SEPARATOR,
             item("About", self.show_about),
             item("Exit", self.exit_application),
@@ -244,346 +259,357 @@ class NetworkTaskbarWidget:
 
         # Create tray icon
         self.tray_icon = pystray.Icon(
-            "network_status", initial_icon, "Network Status Widget", menu
+            "network_status", initial_icon, self.displayed_tooltip, menu
         )
 
-    def show_status(self, icon=None, item=None):
-        """Show current network status in a message box"""
-
-        def show_dialog():
-            status_text = {
-                "good": "Good Connection",
-                "slow": "Slow Connection",
-                "no_connection": "No Connection",
-                "unknown": "Checking...",
-            }
-
-            message = f"Network Status: {status_text[self.current_status]}\n"
-            message += f"Signal Bars: {self.current_signal_strength}/{self.settings['signal_bars']}\n"
-            if self.last_response_time > 0:
-                message += f"Ping Time: {self.last_response_time:.0f}ms\n"
-            message += f"Ping Host: {self.settings['ping_host']} (Google DNS)\n"
-            message += f"Check Interval: {self.settings['ping_interval']} seconds"
-
-            # Create a proper dialog window
-            root = tk.Tk()
-            root.title("Network Status")
-            root.geometry("400x200")
-            root.resizable(False, False)
-
-            # Center the window
-            root.update_idletasks()
-            x = (root.winfo_screenwidth() // 2) - (400 // 2)
-            y = (root.winfo_screenheight() // 2) - (200 // 2)
-            root.geometry(f"400x200+{x}+{y}")
-
-            # Add message text
-            text_widget = tk.Text(root, wrap=tk.WORD, padx=10, pady=10)
-            text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-            text_widget.insert(tk.END, message)
-            text_widget.config(state=tk.DISABLED)
-
-            # Add close button
-            close_btn = tk.Button(root, text="Close", command=root.destroy, width=10)
-            close_btn.pack(pady=10)
-
-            root.focus_force()
-            root.mainloop()
-
-        # Run dialog in separate thread to avoid blocking
-        threading.Thread(target=show_dialog, daemon=True).start()
+    def create_aggregate_mode_item(self, mode):
+        """Create a radio menu item selecting a multi-target aggregation mode"""
+        from pystray import MenuItem as item
 
-    def set_ping_interval(self, interval):
-        """Set the ping interval"""
-        self.settings["ping_interval"] = interval
-        self.save_settings()
-
-    def set_custom_interval(self, icon=None, item=None):
-        """Set a custom ping interval"""
-
-        def show_dialog():
-            root = tk.Tk()
-            root.title("Custom Interval")
-            root.geometry("300x150")
-            root.resizable(False, False)
-
-            # Center the window
-            root.update_idletasks()
-            x = (root.winfo_screenwidth() // 2) - (300 // 2)
-            y = (root.winfo_screenheight() // 2) - (150 // 2)
-            root.geometry(f"300x150+{x}+{y}")
-
-            # Add label
-            label = tk.Label(root, text="Enter ping interval in seconds (1-300):")
-            label.pack(pady=10)
-
-            # Add entry
-            entry_var = tk.StringVar(value=str(self.settings["ping_interval"]))
-            entry = tk.Entry(root, textvariable=entry_var, width=20)
-            entry.pack(pady=5)
-            entry.focus()
-
-            # Add buttons
-            button_frame = tk.Frame(root)
-            button_frame.pack(pady=10)
-
-            def save_interval():
-                try:
-                    interval = int(entry_var.get())
-                    if 1 <= interval <= 300:
-                        self.settings["ping_interval"] = interval
-                        self.save_settings()
-                        root.destroy()
-                    else:
-                        tk.messagebox.showerror(
-                            "Error", "Please enter a value between 1 and 300"
-                        )
-                except ValueError:
-                    tk.messagebox.showerror("Error", "Please enter a valid number")
-
-            ok_btn = tk.Button(button_frame, text="OK", command=save_interval, width=8)
-            ok_btn.pack(side=tk.LEFT, padx=5)
-
-            cancel_btn = tk.Button(
-                button_frame, text="Cancel", command=root.destroy, width=8
-            )
-            cancel_btn.pack(side=tk.LEFT, padx=5)
-
-            # Bind Enter key to save
-            root.bind("<Return>", lambda e: save_interval())
-
-            root.focus_force()
-            root.mainloop()
+        return item(
+            mode.capitalize(),
+            lambda: self.set_aggregate_mode(mode),
+            checked=lambda menu_item: self.settings["aggregate_mode"] == mode,
+            radio=True,
+        )
 
-        threading.Thread(target=show_dialog, daemon=True).start()
+    def create_burst_item(self, count):
+        """Create a radio menu item selecting how many echoes each check sends"""
+        from pystray import MenuItem as item
 
+        return item(
+            "Single echo" if count == 1 else f"{count} echoes",
+            lambda: self.set_burst_count(count),
+            checked=lambda menu_item: self.settings["burst_count"] == count,
+            radio=True,
+        )
 
+    def create_probe_mode_item(self, mode):
+        """Create a radio menu item selecting how the connection is probed"""
+        from pystray import MenuItem as item
 
-    def set_timeout(self, icon=None, item=None):
-        """Set request timeout"""
+        labels = {"icmp": "ICMP Ping", "tcp": "TCP Connect", "http": "HTTP Request"}
+        return item(
+            labels[mode],
+            lambda: self.set_probe_mode(mode),
+            checked=lambda menu_item: self.settings["probe_mode"] == mode,
+            radio=True,
+        )
 
-        def show_dialog():
-            root = tk.Tk()
-            root.title("Set Timeout")
-            root.geometry("300x150")
-            root.resizable(False, False)
-
-            # Center the window
-            root.update_idletasks()
-            x = (root.winfo_screenwidth() // 2) - (300 // 2)
-            y = (root.winfo_screenheight() // 2) - (150 // 2)
-            root.geometry(f"300x150+{x}+{y}")
-
-            # Add label
-            label = tk.Label(root, text="Enter request timeout in seconds (1-30):")
-            label.pack(pady=10)
-
-            # Add entry
-            entry_var = tk.StringVar(value=str(self.settings["timeout"]))
-            entry = tk.Entry(root, textvariable=entry_var, width=20)
-            entry.pack(pady=5)
-            entry.focus()
-
-            # Add buttons
-            button_frame = tk.Frame(root)
-            button_frame.pack(pady=10)
-
-            def save_timeout():
-                try:
-                    timeout = int(entry_var.get())
-                    if 1 <= timeout <= 30:
-                        self.settings["timeout"] = timeout
-                        self.save_settings()
-                        root.destroy()
-                    else:
-                        tk.messagebox.showerror(
-                            "Error", "Please enter a value between 1 and 30"
-                        )
-                except ValueError:
-                    tk.messagebox.showerror("Error", "Please enter a valid number")
-
-            ok_btn = tk.Button(button_frame, text="OK", command=save_timeout, width=8)
-            ok_btn.pack(side=tk.LEFT, padx=5)
-
-            cancel_btn = tk.Button(
-                button_frame, text="Cancel", command=root.destroy, width=8
+    def rolling_stats_text(self, stats):
+        """Status dialog lines summarising the rolling statistics window"""
+        if stats.count == 0:
+            return ""
+        text = f"Loss: {stats.loss_rate:.0%} of last {stats.count} checks\n"
+        if stats.ewma is not None:
+            text += f"Average: {stats.ewma:.0f}ms, Jitter: {stats.jitter:.0f}ms\n"
+            text += (
+                f"p50/p95/p99: {stats.percentile(50):.0f}"
+                f"/{stats.percentile(95):.0f}/{stats.percentile(99):.0f}ms\n"
             )
-            cancel_btn.pack(side=tk.LEFT, padx=5)
-
-            # Bind Enter key to save
-            root.bind("<Return>", lambda e: save_timeout())
-
-            root.focus_force()
-            root.mainloop()
-
-        threading.Thread(target=show_dialog, daemon=True).start()
-
-    def test_connection(self, icon=None, item=None):
-        """Test the current connection"""
+        return text
+
+    def rollup_text(self):
+        """Status dialog lines with uptime and latency for the last hour/day/week"""
+        text = ""
+        now = time.time()
+        for span in ("hour", "day", "week"):
+            summary = self.rollups.summary(span, now)
+            if summary.uptime is None:
+                continue
+            text += f"Last {span}: {summary.uptime:.1%} up"
+            if summary.rtt_mean is not None:
+                text += (
+                    f", avg {summary.rtt_mean:.0f}ms"
+                    f" ({summary.rtt_min:.0f}-{summary.rtt_max:.0f}ms)"
+                )
+            text += f", {summary.lost / summary.count:.1%} loss\n"
+        return text
+
+    def status_message(self):
+        """Text of the status dialog"""
+        status_text = {
+            "good": "Good Connection",
+            "slow": "Slow Connection",
+            "no_connection": "No Connection",
+            "unknown": "Checking...",
+        }
 
-        def show_test():
-            root = tk.Tk()
-            root.title("Connection Test")
-            root.geometry("350x200")
-            root.resizable(False, False)
-
-            # Center the window
-            root.update_idletasks()
-            x = (root.winfo_screenwidth() // 2) - (350 // 2)
-            y = (root.winfo_screenheight() // 2) - (200 // 2)
-            root.geometry(f"350x200+{x}+{y}")
-
-            # Add status label
-            status_label = tk.Label(
-                root, text="Testing connection... Please wait.", pady=20
+        message = f"Network Status: {status_text[self.current_status]}\n"
+        message += f"Signal Bars: {self.current_signal_strength}/{self.settings['signal_bars']}\n"
+        if self.last_response_time > 0:
+            message += f"Ping Time: {self.last_response_time:.0f}ms\n"
+        message += f"Ping Host: {self.settings['ping_host']} (Google DNS)\n"
+        if self.dns_status is not None:
+            message += self.dns_status_text().strip() + "\n"
+        if self.settings["diagnose_path"]:
+            message += self.path_status_text()
+        if self.settings["probe_mode"] == "tcp":
+            message += f"Probe: TCP connect, port {self.settings['tcp_port']}\n"
+        elif self.settings["probe_mode"] == "http":
+            message += f"Probe: HTTP {self.settings['http_url']}\n"
+            timing = self.last_http_timing
+            if timing is not None:
+                message += (
+                    f"HTTP {timing.status}: connect {timing.connect:.0f}ms,"
+                    f" TLS {timing.tls:.0f}ms, first byte {timing.ttfb:.0f}ms"
+                    f"{' (reused)' if timing.reused else ''}\n"
+                )
+        message += self.rolling_stats_text(self.signal_smoother.stats)
+        burst = self.last_burst
+        if burst is not None:
+            message += f"Burst: {burst.received}/{burst.sent} replies, {burst.loss:.0%} loss"
+            if burst.avg is not None:
+                message += (
+                    f", {burst.min:.0f}/{burst.avg:.0f}/{burst.max:.0f}ms"
+                    f" min/avg/max, jitter {burst.jitter:.1f}ms"
+                )
+            message += "\n"
+        message += self.rollup_text()
+        if self.network_changes:
+            message += f"Network changes seen: {self.network_changes}\n"
+        if self.power_policy is not None:
+            message += self.power_policy.state_text() + "\n"
+        message += f"Check Interval: {self.settings['ping_interval']} seconds"
+        if self.settings["adaptive_interval"]:
+            message += (
+                f"\nAdaptive Interval: {self.adaptive_interval.current:g} seconds"
+                f" ({self.adaptive_interval.probes_saved} probes saved)"
             )
-            status_label.pack()
-
-            # Add progress indicator (simple text animation)
-            progress_label = tk.Label(root, text="●", font=("Arial", 20))
-            progress_label.pack()
-
-            result_text = tk.Text(root, height=6, width=40, wrap=tk.WORD)
-            result_text.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
-
-            close_btn = tk.Button(root, text="Close", command=root.destroy, width=10)
-            close_btn.pack(pady=5)
-
-            def run_test():
-                try:
-                    # Animate progress
-                    for i in range(3):
-                        progress_label.config(text="●" * (i + 1))
-                        root.update()
-                        time.sleep(0.5)
-
-                    signal_strength, status = self.check_network_status()
-
-                    status_text = {
-                        "good": "Good Connection",
-                        "slow": "Slow Connection",
-                        "no_connection": "No Connection",
-                        "unknown": "Connection Test Failed",
-                    }
-
-                    message = f"Test Result: {status_text[status]}\n"
-                    if self.last_response_time > 0:
-                        message += f"Ping Time: {self.last_response_time:.0f}ms\n"
-                    message += f"Signal Bars: {signal_strength}/{self.settings['signal_bars']}\n"
-                    message += f"Host Tested: {self.settings['ping_host']} (Google DNS)"
+        if self.target_results:
+            message += f"\n\nTargets ({self.settings['aggregate_mode']}):"
+            for result in self.target_results.values():
+                message += f"\n  {result.host}: {status_text[result.status]}"
+                if result.response_time > 0:
+                    message += f" ({result.response_time:.0f}ms)"
+                stats = self.target_stats.get(result.host)
+                if stats is not None and stats.ewma is not None:
+                    message += (
+                        f", avg {stats.ewma:.0f}ms, p95 {stats.percentile(95):.0f}ms,"
+                        f" loss {stats.loss_rate:.0%}"
+                    )
+        return message
+
+    def diagnostics_message(self):
+        """Text of the diagnostics dialog"""
+        diagnostics = self.diagnostics
+        if diagnostics is None:
+            message = "Cycle timings are off; turn on Record Cycle Timings to collect them.\n"
+        else:
+            message = diagnostics.summary() + "\n"
+        profile = self.profile_capture
+        if profile is not None:
+            message += (
+                f"\nProfiling with {profile.profiler}:"
+                f" {profile.cycles - profile.remaining} of {profile.cycles} cycles"
+                f"\nOutput: {profile.path}"
+            )
+        elif self.last_profile is not None:
+            message += (
+                f"\nLast profile: {self.last_profile}"
+                f"\nRead it with: python -m pstats {os.path.basename(self.last_profile)}"
+            )
+        return message
+
+    def path_status_text(self):
+        """Status dialog lines with the result of each layer of the path diagnosis"""
+        if self.gateway is None:
+            gateway = "no default route" if self.gateway_discovery.supported else "unknown"
+        elif self.gateway_rtt is None:
+            gateway = f"{self.gateway} not responding"
+        else:
+            gateway = f"{self.gateway} {self.gateway_rtt:.0f}ms"
+        dns = self.dns_status or "not probed"
+        internet = "ok" if self.current_signal_strength else "failed"
+        text = f"Path: gateway {gateway}, DNS {dns}, internet {internet}\n"
+        if self.path_layer is not None:
+            text += f"Fault: {LAYER_TEXT[self.path_layer]}\n"
+        return text
+
+    def open_dialog(self, name, *args):
+        """Ask the UI thread to show a dialog, starting the thread on first use"""
+        with self.dialog_lock:
+            if self.dialog_thread is None:
+                self.dialog_thread = threading.Thread(
+                    target=self.run_dialogs, daemon=True
+                )
+                self.dialog_thread.start()
+        self.dialog_commands.put((name, args))
+
+    def run_dialogs(self):
+        """UI thread owning the Tk root and every dialog window"""
+        # Tk and the dialog code load on the first dialog, not at startup
+        import network_dialogs
+
+        network_dialogs.DialogHost(self, self.dialog_commands).run()
 
-                    status_label.config(text="Test Complete!")
-                    progress_label.config(text="✓", fg="green")
-                    result_text.insert(tk.END, message)
-                    result_text.config(state=tk.DISABLED)
+    def show_status(self, icon=None, item=None):
+        """Show current network status in a message box"""
+        self.open_dialog("show_status")
 
-                except Exception as e:
-                    status_label.config(text="Test Failed!")
-                    progress_label.config(text="✗", fg="red")
-                    result_text.insert(tk.END, f"Connection test failed: {str(e)}")
-                    result_text.config(state=tk.DISABLED)
+    def show_diagnostics(self, icon=None, item=None):
+        """Show the per-cycle timings and profile state"""
+        self.open_dialog("show_diagnostics")
 
-            # Run test in background
-            threading.Thread(target=run_test, daemon=True).start()
+    def toggle_diagnostics(self, icon=None, item=None):
+        """Start or stop recording per-cycle timings"""
+        self.set_diagnostics(self.diagnostics is None)
 
-            root.focus_force()
-            root.mainloop()
+    def profile_cycles(self, icon=None, item=None):
+        """Profile the next few cycles to a file"""
+        self.start_profile()
+        self.show_diagnostics()
 
-        threading.Thread(target=show_test, daemon=True).start()
+    def set_burst_count(self, count):
+        """Set how many echoes each ICMP check sends"""
+        self.settings["burst_count"] = count
+        self.apply_settings()
 
-    def show_about(self, icon=None, item=None):
-        """Show about dialog"""
+    def set_probe_mode(self, mode):
+        """Set whether checks use ICMP echo or a TCP handshake"""
+        self.settings["probe_mode"] = mode
+        self.apply_settings()
 
-        def show_dialog():
-            root = tk.Tk()
-            root.title("About Network Status Widget")
-            root.geometry("450x300")
-            root.resizable(False, False)
+    def set_aggregate_mode(self, mode):
+        """Set how multi-target results are reduced to one status"""
+        self.settings["aggregate_mode"] = mode
+        self.apply_settings()
 
-            # Center the window
-            root.update_idletasks()
-            x = (root.winfo_screenwidth() // 2) - (450 // 2)
-            y = (root.winfo_screenheight() // 2) - (300 // 2)
-            root.geometry(f"450x300+{x}+{y}")
+    def set_ping_interval(self, interval):
+        """Set the ping interval"""
+        self.settings["ping_interval"] = interval
+        self.apply_settings()
 
-            about_text = """Network Status Widget v1.1
+    def toggle_adaptive_interval(self, icon=None, item=None):
+        """Switch between the fixed and the adaptive ping interval"""
+        self.settings["adaptive_interval"] = not self.settings["adaptive_interval"]
+        self.apply_settings()
 
-A Windows taskbar widget that shows network connectivity status using signal bars.
+    def toggle_power_saving(self, icon=None, item=None):
+        """Switch probing less on battery and pausing when locked or idle"""
+        self.settings["power_saving"] = not self.settings["power_saving"]
+        self.apply_settings()
 
-Author: mrbeandev
-Website: mrbean.dev
-GitHub: github.com/mrbeandev
-
-Features:
-• 6-bar signal strength indicator
-• Color-coded status (Green/Orange/Red)
-• Customizable ping intervals
-• Google DNS connectivity check
-• System tray integration
-
-Ping Host: 8.8.8.8 (Google DNS)
+    def set_custom_interval(self, icon=None, item=None):
+        """Set a custom ping interval"""
+        self.show_number_dialog(
+            "Custom Interval",
+            "Enter ping interval in seconds (1-300):",
+            "ping_interval",
+            1,
+            300,
+        )
 
-This widget monitors your internet connection by pinging Google's DNS server (8.8.8.8) and displays the connection quality using colored signal bars in your system tray.
+    def set_adaptive_bounds(self, icon=None, item=None):
+        """Set the fastest and slowest adaptive ping intervals"""
+        self.open_dialog("show_adaptive_bounds")
 
-Made with ❤️ for Windows users"""
+    def set_tcp_port(self, icon=None, item=None):
+        """Set the port used by TCP connect probes"""
+        self.show_number_dialog(
+            "TCP Port", "Enter the TCP port to probe (1-65535):", "tcp_port", 1, 65535
+        )
 
-            # Add text widget
-            text_widget = tk.Text(root, wrap=tk.WORD, padx=10, pady=10)
-            text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-            text_widget.insert(tk.END, about_text)
-            text_widget.config(state=tk.DISABLED)
+    def set_http_url(self, icon=None, item=None):
+        """Set the URL used by HTTP probes"""
 
-            # Add close button
-            close_btn = tk.Button(root, text="Close", command=root.destroy, width=10)
-            close_btn.pack(pady=10)
+        def parse_url(text):
+            url = text.strip()
+            if urlsplit(url).scheme not in ("http", "https") or not urlsplit(url).hostname:
+                raise ValueError("Please enter an http:// or https:// URL")
+            return url
 
-            root.focus_force()
-            root.mainloop()
+        self.show_setting_dialog(
+            "HTTP URL", "Enter the URL to probe:", "http_url", parse_url, width=40
+        )
 
-        threading.Thread(target=show_dialog, daemon=True).start()
+    def show_number_dialog(self, title, prompt, setting, minimum, maximum):
+        """Ask for a whole number setting within a range and apply it"""
 
-    def monitor_network(self):
-        """Background thread to monitor network status"""
-        while self.monitoring:
+        def parse_number(text):
             try:
-                signal_strength, status = self.check_network_status()
+                value = int(text)
+            except ValueError:
+                raise ValueError("Please enter a valid number")
+            if not minimum <= value <= maximum:
+                raise ValueError(f"Please enter a value between {minimum} and {maximum}")
+            return value
 
-                # Update current status
-                self.current_signal_strength = signal_strength
-                self.current_status = status
+        self.show_setting_dialog(title, prompt, setting, parse_number)
 
-                # Update tray icon
-                self.update_tray_icon()
+    def show_setting_dialog(self, title, prompt, setting, parse, width=20):
+        """Ask for a setting value, validate it with `parse` and apply it"""
+        self.open_dialog("show_setting", title, prompt, setting, parse, width)
 
-                # Wait for next check
-                time.sleep(self.settings["ping_interval"])
+    def set_timeout(self, icon=None, item=None):
+        """Set request timeout"""
+        self.show_number_dialog(
+            "Set Timeout", "Enter request timeout in seconds (1-30):", "timeout", 1, 30
+        )
 
-            except Exception as e:
-                print(f"Error in network monitoring: {e}")
-                time.sleep(5)  # Wait 5 seconds on error
+    def test_connection(self, icon=None, item=None):
+        """Test the current connection"""
+        self.open_dialog("show_test")
 
-    def start_monitoring(self):
-        """Start the network monitoring thread"""
-        self.monitor_thread = threading.Thread(target=self.monitor_network, daemon=True)
-        self.monitor_thread.start()
+    def show_about(self, icon=None, item=None):
+        """Show about dialog"""
+        self.open_dialog("show_about")
 
     def exit_application(self, icon=None, item=None):
         """Exit the application"""
-        self.monitoring = False
+        self.stop_monitoring()
+        if self.dialog_thread is not None:
+            self.dialog_commands.put(("quit", ()))
         if hasattr(self, "tray_icon"):
             self.tray_icon.stop()
 
-    def run(self):
-        """Run the application"""
+    def run(self, startup_mark=None):
+        """Run the application
+
+        With `startup_mark`, the time the tray icon became visible is written to
+        that file and the widget exits; benchmark_startup.py uses this.
+        """
+
+        def on_ready(icon):
+            icon.visible = True
+            if startup_mark:
+                with open(startup_mark, "w") as f:
+                    json.dump({"time": time.time(), "modules": len(sys.modules)}, f)
+                self.exit_application()
+
         try:
             # Start the tray icon
-            self.tray_icon.run()
+            self.tray_icon.run(setup=on_ready)
         except KeyboardInterrupt:
             self.exit_application()
 
 
 def main():
     """Main function to start the application"""
+    parser = argparse.ArgumentParser(description="Network Status Widget")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="monitor without a tray icon, printing one JSON object per check",
+    )
+    parser.add_argument(
+        "--output", help="append the --headless JSON lines to this file, not stdout"
+    )
+    parser.add_argument(
+        "--settings",
+        metavar="FILE",
+        help="read and save settings in FILE instead of the per-user settings file",
+    )
+    parser.add_argument(
+        "--startup-mark",
+        metavar="FILE",
+        help="write the time the tray icon appeared to FILE, then exit",
+    )
+    args = parser.parse_args()
+    if args.headless:
+        run_headless(args.output, args.settings)
+        return
+
     # Check if required modules are available
     try:
         import pystray
@@ -613,8 +639,8 @@ def main():
 
     # Create and run the widget
     try:
-        widget = NetworkTaskbarWidget()
-        widget.run()
+        widget = NetworkTaskbarWidget(args.settings)
+        widget.run(args.startup_mark)
     except Exception as e:
         print(f"Error starting application: {e}")
         input("Press Enter to exit...")
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Tests for the DNS client and resolver cache in network_dns
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Queries go to a stub DNS server on 127.0.0.1 that answers, delays or drops
+each query as the test asks.
+"""
+
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network_dns import (  # noqa: E402
+    DNS_CLASS_IN,
+    DNS_TYPE_A,
+    DnsProber,
+    ResolverCache,
+    build_dns_query,
+    dns_header,
+    dns_record,
+    parse_dns_response,
+)
+
+DNS_TYPE_CNAME = 5
+
+
+def encode_name(name):
+    labels = name.encode("ascii").split(b".")
+    return b"".join(bytes([len(label)]) + label for label in labels) + b"\x00"
+
+
+def answer_record(name, rtype, ttl, rdata):
+    """One resource record; `name` is already encoded (labels or a pointer)"""
+    return name + dns_record.pack(rtype, DNS_CLASS_IN, ttl, len(rdata)) + rdata
+
+
+def pointer(offset):
+    return struct.pack("!H", 0xC000 | offset)
+
+
+def response_to(query, records, rcode=0):
+    """Response echoing the question of `query`, with the given answer records"""
+    query_id = dns_header.unpack_from(query)[0]
+    header = dns_header.pack(query_id, 0x8180 | rcode, 1, len(records), 0, 0)
+    return header + query[dns_header.size :] + b"".join(records)
+
+
+def a_response(query, address, ttl):
+    """A single A record whose name points back at the question"""
+    rdata = socket.inet_aton(address)
+    return response_to(query, [answer_record(pointer(12), DNS_TYPE_A, ttl, rdata)])
+
+
+class StubDnsServer:
+    """UDP responder whose answers are decided by `self.respond(query)`
+
+    `respond` returns (delay, packet), or None to drop the query.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.queries = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                query, source = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            self.queries += 1
+            reply = self.respond(query)
+            if reply is None:
+                continue
+            delay, packet = reply
+            timer = threading.Timer(delay, self.send, (packet, source))
+            timer.daemon = True
+            timer.start()
+
+    def send(self, packet, destination):
+        try:
+            self.sock.sendto(packet, destination)
+        except OSError:
+            pass
+
+    def close(self):
+        self.sock.close()
+
+
+class ParseDnsResponseTest(unittest.TestCase):
+    def test_a_record(self):
+        query = build_dns_query("example.com", 0x1234)
+        parsed = parse_dns_response(a_response(query, "192.0.2.1", 300), 0x1234)
+        self.assertEqual(parsed, (0, [("192.0.2.1", 300)]))
+
+    def test_cname_chain_with_compressed_names(self):
+        query = build_dns_query("www.example.com", 0x0102)
+        rdata_start = 2 + dns_record.size  # Past a pointer name and the record header
+        # www.example.com CNAME edge.example.com, with "example.com" by pointer
+        first = answer_record(
+            pointer(12), DNS_TYPE_CNAME, 60, b"\x04edge" + pointer(12 + 4)
+        )
+        edge = len(query) + rdata_start
+        # edge.example.com CNAME a.cdn.test, written out in full
+        second = answer_record(
+            pointer(edge), DNS_TYPE_CNAME, 30, encode_name("a.cdn.test")
+        )
+        target = len(query) + len(first) + rdata_start
+        addresses = [
+            answer_record(pointer(target), DNS_TYPE_A, 20, socket.inet_aton(ip))
+            for ip in ("198.51.100.7", "198.51.100.8")
+        ]
+        data = response_to(query, [first, second] + addresses)
+
+        rcode, parsed = parse_dns_response(data, 0x0102)
+        self.assertEqual(rcode, 0)
+        self.assertEqual(parsed, [("198.51.100.7", 20), ("198.51.100.8", 20)])
+
+    def test_nxdomain(self):
+        query = build_dns_query("missing.test", 7)
+        self.assertEqual(parse_dns_response(response_to(query, [], 3), 7), (3, []))
+
+    def test_other_id_or_query_is_ignored(self):
+        query = build_dns_query("example.com", 1)
+        self.assertIsNone(parse_dns_response(a_response(query, "192.0.2.1", 5), 2))
+        self.assertIsNone(parse_dns_response(query, 1))
+        self.assertIsNone(parse_dns_response(b"\x00\x01", 1))
+
+
+class DnsProberTest(unittest.TestCase):
+    def setUp(self):
+        self.prober = DnsProber()
+        self.replies = []  # (delay, address) per query, None to drop
+        self.server = StubDnsServer(self.respond)
+
+    def tearDown(self):
+        self.prober.close()
+        self.server.close()
+
+    def respond(self, query):
+        reply = self.replies.pop(0) if self.replies else None
+        if reply is None:
+            return None
+        delay, address = reply
+        return delay, a_response(query, address, 60)
+
+    def query(self, timeout):
+        return self.prober.query("example.com", "127.0.0.1", timeout, self.server.port)
+
+    def test_answer(self):
+        self.replies.append((0, "192.0.2.1"))
+        answer = self.query(1)
+        self.assertEqual(answer.rcode, 0)
+        self.assertEqual(answer.addresses, [("192.0.2.1", 60)])
+        self.assertGreater(answer.rtt, 0)
+
+    def test_timeout(self):
+        self.replies.append(None)
+        started = time.monotonic()
+        self.assertIsNone(self.query(0.2))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_late_answer_is_discarded(self):
+        self.replies.append((0.3, "192.0.2.1"))
+        self.replies.append((0, "192.0.2.2"))
+        # The same query ID twice, so only the drain tells the answers apart
+        with mock.patch("network_dns.random.getrandbits", return_value=0x4242):
+            self.assertIsNone(self.query(0.1))
+            time.sleep(0.4)  # The late answer is now waiting on the socket
+            answer = self.query(1)
+        self.assertEqual(answer.addresses, [("192.0.2.2", 60)])
+
+    def test_parallel_queries_time_out_together(self):
+        timeouts = []
+        threads = [
+            threading.Thread(target=lambda: timeouts.append(self.query(0.3)))
+            for _ in range(4)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(timeouts, [None] * 4)
+        self.assertLess(time.monotonic() - started, 0.6)
+
+
+class ResolverCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.ttl = 60
+        self.address = "192.0.2.10"
+        self.answering = True
+        self.server = StubDnsServer(self.respond)
+        self.cache = ResolverCache(
+            "127.0.0.1", min_ttl=5, max_ttl=3600, port=self.server.port
+        )
+        self.now = 1000.0
+        patcher = mock.patch("network_dns.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # With the stub silent, the system resolver must fail too
+        patcher = mock.patch(
+            "network_dns.socket.gethostbyname",
+            side_effect=socket.gaierror("resolver down"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.close()
+        self.server.close()
+
+    def respond(self, query):
+        if not self.answering:
+            return None
+        return 0, a_response(query, self.address, self.ttl)
+
+    def expiry(self, host):
+        return self.cache.entries[host][1] - self.now
+
+    def test_answer_is_cached_until_ttl_expires(self):
+        self.assertEqual(self.cache.resolve("probe.test", 0.5), self.address)
+        self.assertEqual(self.expiry("probe.test"), 60)
+
+        self.now += 59
+        self.assertEqual(self.cache.resolve("probe.test", 0.5), self.address)
+        self.assertEqual(self.server.queries, 1)
+
+        self.now += 2
+        self.address = "192.0.2.11"
+        self.assertIsNone(self.cache.cached("probe.test"))
+        self.assertEqual(self.cache.resolve("probe.test", 0.5), "192.0.2.11")
+        self.assertEqual(self.server.queries, 2)
+
+    def test_ttl_is_clamped(self):
+        self.ttl = 0
+        self.cache.resolve("short.test", 0.5)
+        self.assertEqual(self.expiry("short.test"), 5)
+
+        self.ttl = 7 * 24 * 3600
+        self.cache.resolve("long.test", 0.5)
+        self.assertEqual(self.expiry("long.test"), 3600)
+
+    def test_addresses_skip_the_cache(self):
+        self.assertEqual(self.cache.resolve("192.0.2.99"), "192.0.2.99")
+        self.assertEqual(self.server.queries, 0)
+
+    def test_stale_answer_served_while_resolver_fails(self):
+        self.ttl = 0
+        self.cache.resolve("flaky.test", 0.5)
+        self.now += 10
+        self.answering = False
+
+        self.assertEqual(self.cache.resolve("flaky.test", 0.1), self.address)
+        self.assertEqual(self.cache.stale, 1)
+        # Not asked again on every check while it is failing
+        queries = self.server.queries
+        self.assertEqual(self.cache.resolve("flaky.test", 0.1), self.address)
+        self.assertEqual(self.server.queries, queries)
+
+    def test_no_stale_answer_past_max_stale(self):
+        self.cache.resolve("gone.test", 0.5)
+        self.now += self.ttl + self.cache.max_stale + 1
+        self.answering = False
+        with self.assertRaises(OSError):
+            self.cache.resolve("gone.test", 0.1)
+
+    def test_unknown_host_still_fails(self):
+        self.answering = False
+        with self.assertRaises(OSError):
+            self.cache.resolve("never.test", 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
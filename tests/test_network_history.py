@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the sample history store in network_history
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Each test works in its own temporary directory, with damaged segment files
+written by hand where a test needs them.
+"""
+
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network_history import HistorySegment, HistoryStore  # noqa: E402
+
+
+class HistoryStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="nsw-test-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, f"history-{number:08d}.seg")
+
+    def test_records_round_trip(self):
+        store = HistoryStore(self.directory, segment_records=16)
+        target = store.target_id("8.8.8.8")
+        store.append(target, 12.5, "good", timestamp=100.0)
+        store.append(target, None, "no_connection", timestamp=101.0)
+        records = list(store.query(0, 200))
+        store.close()
+        self.assertEqual(
+            [(r.timestamp, r.rtt, r.status) for r in records],
+            [(100.0, 12.5, "good"), (101.0, None, "no_connection")],
+        )
+
+    def test_empty_segment_file_is_skipped(self):
+        open(self.segment_path(1), "wb").close()
+        store = HistoryStore(self.directory, segment_records=16)
+        store.append(store.target_id("host"), 1.0, "good", timestamp=100.0)
+        self.assertEqual(len(list(store.query(0, 200))), 1)
+        store.close()
+        self.assertTrue(os.path.exists(self.segment_path(2)))
+
+    def test_corrupt_count_is_clamped_to_capacity(self):
+        HistorySegment(self.segment_path(1), 4).close()
+        with open(self.segment_path(1), "r+b") as f:
+            f.seek(8)
+            f.write(struct.pack("<Q", 1_000_000))
+
+        segment = HistorySegment(self.segment_path(1))
+        self.assertEqual(segment.count, 4)
+        self.assertTrue(segment.full)
+        segment.close()
+        # The store moves on to a new segment rather than writing past the end
+        store = HistoryStore(self.directory, segment_records=4)
+        store.append(0, 1.0, "good")
+        store.close()
+        self.assertTrue(os.path.exists(self.segment_path(2)))
+
+    def test_targets_file_is_replaced_whole(self):
+        store = HistoryStore(self.directory)
+        store.target_id("a")
+        store.target_id("b")
+        store.close()
+        with open(os.path.join(self.directory, "targets.json")) as f:
+            self.assertEqual(json.load(f), {"a": 0, "b": 1})
+        leftovers = [name for name in os.listdir(self.directory) if name.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
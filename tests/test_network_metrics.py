@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the metrics exposition in network_metrics
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+MonitorMetrics is fed a stand-in for the monitor carrying only the state
+its listener reads.
+"""
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network_metrics import MonitorMetrics  # noqa: E402
+
+
+def fake_monitor(dns_status, last_dns_time):
+    return SimpleNamespace(
+        settings={"targets": []},
+        target_results={},
+        last_burst=None,
+        history_target=lambda: "8.8.8.8",
+        signal_smoother=SimpleNamespace(
+            stats=SimpleNamespace(ewma=25.0, jitter=1.0, loss_rate=0.0)
+        ),
+        current_status="good",
+        current_signal_strength=6,
+        dns_status=dns_status,
+        last_dns_time=last_dns_time,
+    )
+
+
+class MonitorMetricsTest(unittest.TestCase):
+    def render(self, dns_status, last_dns_time):
+        metrics = MonitorMetrics()
+        metrics.observe(fake_monitor(dns_status, last_dns_time), 25.0)
+        return metrics.render().decode()
+
+    def test_dns_rtt_exported_after_an_answer(self):
+        self.assertIn("network_dns_rtt_seconds 0.012\n", self.render("good", 12.0))
+        self.assertIn("network_dns_rtt_seconds 0.45\n", self.render("slow", 450.0))
+
+    def test_dns_rtt_not_exported_while_lookups_fail(self):
+        self.assertNotIn("network_dns_rtt_seconds", self.render("failed", 0))
+
+    def test_dns_rtt_not_exported_before_the_first_probe(self):
+        self.assertNotIn("network_dns_rtt_seconds", self.render(None, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for the power policy in network_power
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+The power and session readers are replaced by callables that replay the
+answers each test needs, and the clock is patched. linux_on_battery reads
+a fake power_supply tree in a temporary directory.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network_power import (  # noqa: E402
+    SESSION_FAILURE_LIMIT,
+    PowerPolicy,
+    linux_on_battery,
+)
+
+
+class SessionReader:
+    """Session source that replays `answers`, repeating the last one"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+class PowerPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("network_power.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def policy(self, session):
+        return PowerPolicy(
+            idle_after=600,
+            check_interval=10,
+            power_source=lambda: False,
+            session_source=session,
+            session_interval=60,
+        )
+
+    def test_one_empty_read_does_not_disable_the_session(self):
+        session = SessionReader((None, None), (True, None))
+        policy = self.policy(session)
+        policy.refresh()
+        self.assertIs(policy.session_source, session)
+
+        policy.refresh(force=True)
+        self.assertEqual(policy.pause_reason, "locked")
+        self.assertEqual(policy.session_failures, 0)
+
+    def test_repeated_empty_reads_disable_the_session(self):
+        session = SessionReader((None, None))
+        policy = self.policy(session)
+        for _ in range(SESSION_FAILURE_LIMIT):
+            policy.refresh(force=True)
+        self.assertIsNone(policy.session_source)
+        self.assertEqual(session.reads, SESSION_FAILURE_LIMIT)
+
+    def test_missing_loginctl_disables_the_session_at_once(self):
+        policy = self.policy(SessionReader(FileNotFoundError("loginctl")))
+        policy.refresh()
+        self.assertIsNone(policy.session_source)
+
+    def test_session_read_less_often_than_power_while_probing(self):
+        session = SessionReader((False, None))
+        policy = self.policy(session)
+        policy.refresh()
+        for _ in range(5):
+            self.now += 10
+            policy.refresh()
+        self.assertEqual(session.reads, 1)
+
+        self.now += 10
+        policy.refresh()
+        self.assertEqual(session.reads, 2)
+
+    def test_session_read_every_check_while_paused(self):
+        session = SessionReader((True, None), (True, None), (False, None))
+        policy = self.policy(session)
+        policy.refresh()
+        self.assertEqual(policy.pause_reason, "locked")
+
+        self.now += 10
+        policy.refresh()
+        self.now += 10
+        policy.refresh()
+        self.assertEqual(session.reads, 3)
+        self.assertIsNone(policy.pause_reason)
+
+
+class LinuxOnBatteryTest(unittest.TestCase):
+    """linux_on_battery over a fake /sys/class/power_supply"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="nsw-test-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def supply(self, name, **attributes):
+        directory = os.path.join(self.root, name)
+        os.mkdir(directory)
+        for attribute, value in attributes.items():
+            with open(os.path.join(directory, attribute), "w") as f:
+                f.write(value + "\n")
+
+    def test_desktop_with_offline_usb_supply_has_no_battery(self):
+        self.supply("ucsi-source-psy-USBC000:001", type="USB", online="0")
+        self.supply("ucsi-source-psy-USBC000:002", type="USB", online="0")
+        self.assertIsNone(linux_on_battery(self.root))
+
+    def test_no_supplies(self):
+        self.assertIsNone(linux_on_battery(self.root))
+
+    def test_laptop_on_mains(self):
+        self.supply("AC", type="Mains", online="1")
+        self.supply("BAT0", type="Battery", status="Charging")
+        self.supply("ucsi-source-psy-USBC000:001", type="USB", online="0")
+        self.assertFalse(linux_on_battery(self.root))
+
+    def test_laptop_on_battery(self):
+        self.supply("AC", type="Mains", online="0")
+        self.supply("BAT0", type="Battery", status="Discharging")
+        self.supply("ucsi-source-psy-USBC000:001", type="USB", online="0")
+        self.assertTrue(linux_on_battery(self.root))
+
+    def test_laptop_charging_over_usb_c(self):
+        self.supply("BAT0", type="Battery", status="Charging")
+        self.supply("ucsi-source-psy-USBC000:001", type="USB", online="1")
+        self.assertFalse(linux_on_battery(self.root))
+
+    def test_battery_status_without_a_mains_supply(self):
+        self.supply("BAT0", type="Battery", status="Discharging")
+        self.assertTrue(linux_on_battery(self.root))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Tests for the HTTP prober in network_probes
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+
+Runs http.server on 127.0.0.1, over TLS as well when openssl is available to
+make a throwaway certificate.
+"""
+
+import http.server
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network_probes import HttpProber  # noqa: E402
+
+
+SLOW_DELAY = 0.05  # Seconds /slow waits before answering
+HANG_DELAY = 0.5  # Seconds /hang waits, past the probe's timeout
+BIG_BODY = b"x" * 65536
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Keep-alive handler; the path picks the behaviour under test"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(SLOW_DELAY)
+        elif self.path == "/hang":
+            time.sleep(HANG_DELAY)
+        body = BIG_BODY if self.path == "/big" else b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path == "/drop":
+            # Close without announcing it, as an idle timeout on the server would
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """ThreadingHTTPServer on a free loopback port, optionally over TLS"""
+
+    def __init__(self, context=None):
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.connections = 0
+        if context is not None:
+            self.httpd.socket = context.wrap_socket(
+                self.httpd.socket, server_side=True
+            )
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+
+    @property
+    def connections(self):
+        return self.httpd.connections
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_certificate(directory):
+    """Write a self-signed localhost certificate; return (cert, key) paths"""
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1",
+            "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def loopback(host):
+    return "127.0.0.1"
+
+
+class HttpProberTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.prober = HttpProber(max_body=4096, resolve=loopback)
+        self.base = f"http://localhost:{self.server.port}"
+
+    def tearDown(self):
+        self.prober.close()
+        self.server.close()
+
+    def test_cold_probe_times_connect_and_first_byte(self):
+        timing = self.prober.probe(f"{self.base}/slow", 2)
+        self.assertEqual(timing.status, 200)
+        self.assertFalse(timing.reused)
+        self.assertGreater(timing.connect, 0)
+        self.assertEqual(timing.tls, 0)
+        self.assertGreaterEqual(timing.ttfb, SLOW_DELAY * 1000)
+        self.assertGreaterEqual(timing.total, timing.connect + timing.ttfb)
+
+    def test_keep_alive_connection_is_reused(self):
+        first = self.prober.probe(f"{self.base}/", 2)
+        second = self.prober.probe(f"{self.base}/", 2)
+        self.assertFalse(first.reused)
+        self.assertTrue(second.reused)
+        self.assertEqual((second.connect, second.tls), (0, 0))
+        self.assertEqual(self.server.connections, 1)
+
+    def test_body_over_cap_drops_connection(self):
+        timing = self.prober.probe(f"{self.base}/big", 2)
+        self.assertEqual(timing.status, 200)
+        connection = next(iter(self.prober.connections.values()))
+        self.assertIsNone(connection.sock)
+
+        timing = self.prober.probe(f"{self.base}/", 2)
+        self.assertFalse(timing.reused)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_retries_once_when_server_closed_connection(self):
+        self.prober.probe(f"{self.base}/drop", 2)
+        time.sleep(0.1)  # Let the close reach the pooled socket
+
+        timing = self.prober.probe(f"{self.base}/", 2)
+        self.assertIsNotNone(timing)
+        self.assertEqual(timing.status, 200)
+        self.assertFalse(timing.reused)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_timeout_on_reused_connection_is_not_retried(self):
+        self.prober.probe(f"{self.base}/", 2)
+        started = time.monotonic()
+        self.assertIsNone(self.prober.probe(f"{self.base}/hang", 0.2))
+        self.assertLess(time.monotonic() - started, 0.35)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_unreachable_server_returns_none(self):
+        self.server.close()
+        self.assertIsNone(self.prober.probe(f"{self.base}/", 1))
+
+
+@unittest.skipIf(shutil.which("openssl") is None, "openssl is needed for a certificate")
+class HttpsProberTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="nsw-test-")
+        cert, key = make_certificate(self.directory)
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert, key)
+        self.server = LocalServer(server_context)
+        client_context = ssl.create_default_context(cafile=cert)
+        self.prober = HttpProber(resolve=loopback, ssl_context=client_context)
+        self.base = f"https://localhost:{self.server.port}"
+
+    def tearDown(self):
+        self.prober.close()
+        self.server.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_cold_probe_splits_connect_tls_and_first_byte(self):
+        timing = self.prober.probe(f"{self.base}/slow", 2)
+        self.assertEqual(timing.status, 200)
+        self.assertFalse(timing.reused)
+        self.assertGreater(timing.connect, 0)
+        self.assertGreater(timing.tls, 0)
+        self.assertGreaterEqual(timing.ttfb, SLOW_DELAY * 1000)
+        self.assertGreaterEqual(
+            timing.total, timing.connect + timing.tls + timing.ttfb
+        )
+
+    def test_reused_connection_skips_handshakes(self):
+        self.prober.probe(f"{self.base}/", 2)
+        timing = self.prober.probe(f"{self.base}/", 2)
+        self.assertTrue(timing.reused)
+        self.assertEqual((timing.connect, timing.tls), (0, 0))
+        self.assertEqual(self.server.connections, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
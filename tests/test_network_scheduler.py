@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the adaptive interval in network_scheduler
+Author: mrbeandev
+Website: mrbean.dev
+GitHub: github.com/mrbeandev
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network_scheduler import AdaptiveInterval  # noqa: E402
+
+
+class AdaptiveIntervalTest(unittest.TestCase):
+    def test_backs_off_while_good_and_tightens_on_trouble(self):
+        interval = AdaptiveInterval(3, 1, 60)
+        self.assertEqual(interval.next_interval("good"), 6)
+        self.assertEqual(interval.next_interval("good"), 12)
+        self.assertEqual(interval.next_interval("no_connection"), 1)
+
+    def test_probes_saved_never_negative(self):
+        interval = AdaptiveInterval(3, 1, 60)
+        for _ in range(10):
+            interval.next_interval("no_connection")
+        self.assertEqual(interval.probes_saved, 0)
+
+    def test_probes_saved_while_backed_off(self):
+        interval = AdaptiveInterval(3, 1, 12)
+        for _ in range(4):
+            interval.next_interval("good")  # 6, 12, 12, 12 seconds
+        self.assertEqual(interval.probes_saved, 14 - 4)
+
+    def test_unchanged_configure_keeps_the_back_off(self):
+        interval = AdaptiveInterval(3, 1, 60)
+        interval.next_interval("good")
+        interval.next_interval("good")
+        interval.configure(3, 1, 60)
+        self.assertEqual(interval.current, 12)
+
+        interval.configure(5, 1, 60)
+        self.assertEqual(interval.current, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()